@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Startup benchmark of the command line entry points.
+
+Measures the wall time of importing each entry point (and of its --help) in a
+fresh interpreter, and lists the slowest imports reported by `python -X importtime`,
+so heavy module-level imports and worker setup stay visible.
+
+Usage:
+------
+python benchmarks/startup.py [--repeat N] [--top N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, python arguments, working directory)
+ENTRY_POINTS = [
+    ('import hot_peaks_table', ['-c', 'import hot_peaks_table'], REPO_ROOT),
+    ('hot_peaks_table.py --help', ['hot_peaks_table.py', '--help'], REPO_ROOT),
+    ('import bin.Gonen_func', ['-c', 'import bin.Gonen_func'], REPO_ROOT),
+    ('import analyse_peak', ['-c', 'import analyse_peak'], os.path.join(REPO_ROOT, 'bin')),
+]
+
+
+def time_command(args, cwd, repeat):
+    """
+    Run `python args` repeat times and return the wall times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=cwd, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def slowest_imports(args, cwd, top):
+    """
+    Return the top (cumulative microseconds, module) pairs of `python -X importtime args`.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), module.strip()))
+    # only top level packages, their submodules are part of the cumulative time
+    imports = [i for i in imports if '.' not in i[1]]
+    return sorted(imports, reverse=True)[:top]
+
+
+def main(repeat, top):
+    print(f"{'entry point':<30}{'median [s]':>12}{'min [s]':>10}")
+    for name, args, cwd in ENTRY_POINTS:
+        try:
+            times = time_command(args, cwd, repeat)
+        except subprocess.CalledProcessError:
+            print(f"{name:<30}{'failed':>12}")
+            continue
+        print(f"{name:<30}{statistics.median(times):>12.3f}{min(times):>10.3f}")
+
+    for name, args, cwd in ENTRY_POINTS[:1]:
+        print(f"\nslowest imports of '{name}':")
+        for cumulative, module in slowest_imports(args, cwd, top):
+            print(f"  {cumulative / 1e6:8.3f}s  {module}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the startup time of the entry points.")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of runs per entry point.")
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest imports to list.")
+    args = parser.parse_args()
+    main(args.repeat, args.top)
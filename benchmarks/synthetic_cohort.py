@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Synthetic cohort generator for the hot peaks pipeline.
+
+Writes a variant table in the column layout of the pipeline's variant CSV
+(CHROM, POS, REF, ALT, the gnomAD columns, INTERVAL_ID, the GeneHancer and peak
+layers, then ':GT', ':DP' and ':GQ' per sample), a matching sample metadata
+sheet (ID, source, fam_relation, family) and a DSD genes BED file for the TSS distances,
+so the pipeline and the benchmarks can run without the private data.
+
+Usage:
+------
+python benchmarks/synthetic_cohort.py OUTPUT_DIR [--intervals N] [--variants-per-interval N] [--samples N]
+    [--sources N] [--proband-ratio F] [--missing F] [--format csv|parquet] [--seed N]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+GT_VALUES = np.array(['0/1', '1/1', '0|1', '1|1', '0/0'], dtype=object)
+GT_WEIGHTS = [0.5, 0.25, 0.1, 0.05, 0.1]
+MISSING_GT = ' '
+CHROMS = [f'chr{i}' for i in range(1, 23)] + ['chrX']
+GENES_PER_CHROM = 20
+PEAK_LENGTH = 2000
+PEAK_SPACING = 50000
+GENES_PER_PEAK = 3
+WRITE_CHUNK = 100000
+
+
+def make_genes(n_chroms=len(CHROMS), seed=0):
+    """
+    Random DSD genes (name and TSS) on the synthetic chromosomes.
+
+    Returns:
+        pd.DataFrame: BED features with the columns chr, start, end and name.
+    """
+    rng = np.random.default_rng(seed)
+    chroms = np.repeat(CHROMS[:n_chroms], GENES_PER_CHROM)
+    starts = rng.integers(0, 200_000_000, len(chroms))
+    return pd.DataFrame({'chr': chroms, 'start': starts, 'end': starts + 1000,
+                         'name': [f'GENE{i}' for i in range(len(chroms))]})
+
+
+def make_pedigree(n_samples, n_sources=3, proband_ratio=0.5, seed=0):
+    """
+    Sample metadata of a synthetic cohort.
+
+    Parameters:
+        n_samples (int): Number of samples.
+        n_sources (int): Number of sources (cohorts) the samples come from.
+        proband_ratio (float): Fraction of probands (fam_relation 0); the others are parents (1 / 2).
+
+    Returns:
+        pd.DataFrame: The columns ID, source, fam_relation and family. Every proband starts a
+        family, which the parents listed after it (before the next proband) belong to.
+    """
+    rng = np.random.default_rng(seed)
+    is_proband = rng.random(n_samples) < proband_ratio
+    return pd.DataFrame({'ID': [f'S{i:05d}' for i in range(n_samples)],
+                         'source': rng.choice([f'source_{i}' for i in range(n_sources)], n_samples),
+                         'fam_relation': np.where(is_proband, 0, rng.choice([1, 2], n_samples)),
+                         'family': [f'F{i:05d}' for i in np.cumsum(is_proband)]})
+
+
+def make_variants(n_intervals, variants_per_interval, samples, genes, missing=0.9, seed=0, first_interval=0):
+    """
+    Variant table of a synthetic cohort.
+
+    Every interval is a peak of PEAK_LENGTH bases with variants_per_interval variants
+    (rows in INTERVAL_ID order, sorted by POS within a peak), listing up to
+    GENES_PER_PEAK genes of its chromosome.
+
+    Parameters:
+        n_intervals (int): Number of intervals.
+        variants_per_interval (int): Variants of every interval.
+        samples (list): Sample IDs.
+        genes (pd.DataFrame): Genes as returned by `make_genes`.
+        missing (float): Fraction of missing genotypes.
+        seed (int): Random seed.
+        first_interval (int): Number of the first interval, to generate a table in parts.
+
+    Returns:
+        pd.DataFrame: The variant table.
+    """
+    rng = np.random.default_rng(seed)
+    n_variants = n_intervals * variants_per_interval
+    interval = np.repeat(np.arange(first_interval, first_interval + n_intervals), variants_per_interval)
+    chroms = np.array(CHROMS)[interval % len(CHROMS)]
+    peak_from = (interval // len(CHROMS)) * PEAK_SPACING + 10000
+    pos = peak_from + np.sort(rng.integers(0, PEAK_LENGTH, (n_intervals, variants_per_interval)), axis=1).ravel()
+
+    chrom_genes = genes.groupby('chr')['name'].apply(list)
+    peak_genes = [','.join(rng.choice(chrom_genes[chrom], rng.integers(1, GENES_PER_PEAK + 1), replace=False))
+                  for chrom in np.array(CHROMS)[np.arange(first_interval, first_interval + n_intervals) % len(CHROMS)]]
+
+    df = pd.DataFrame({
+        'CHROM': chroms,
+        'POS': pos,
+        'REF': rng.choice(['A', 'C', 'G', 'T'], n_variants),
+        'ALT': rng.choice(['A', 'C', 'G', 'T'], n_variants),
+        'FILTER': 'PASS',
+        'AF': rng.random(n_variants).round(5),
+        'AF_popmax': rng.random(n_variants).round(5),
+        'INTERVAL_ID': [f'peak_{i:08d}' for i in interval],
+        'GHid': 'GH' + pd.Series(interval).astype(str),
+        'GH_is_elite': rng.integers(0, 2, n_variants),
+        'GH_type': rng.choice(['Enhancer', 'Promoter', 'Promoter/Enhancer'], n_variants),
+        'from': peak_from,
+        'to': peak_from + PEAK_LENGTH,
+        'length': PEAK_LENGTH,
+        'DSDgenes_1.5mb': np.repeat(peak_genes, variants_per_interval),
+        'geneHancer': 'GH' + pd.Series(interval).astype(str),
+    })
+
+    samples_data = {}
+    for sample in samples:
+        gt = rng.choice(GT_VALUES, n_variants, p=GT_WEIGHTS)
+        gt[rng.random(n_variants) < missing] = MISSING_GT
+        samples_data[f'{sample}:GT'] = gt
+        samples_data[f'{sample}:DP'] = rng.integers(5, 60, n_variants)
+        samples_data[f'{sample}:GQ'] = rng.integers(10, 99, n_variants)
+    return pd.concat([df, pd.DataFrame(samples_data)], axis=1)
+
+
+def write_cohort(output_dir, n_intervals, variants_per_interval, n_samples, n_sources=3, proband_ratio=0.5,
+                 missing=0.9, output_format='csv', seed=0):
+    """
+    Write the variant table, sample metadata and genes BED of a synthetic cohort.
+
+    The variant table is generated and written WRITE_CHUNK variants at a time.
+
+    Returns:
+        dict: Paths of the 'variants', 'metadata' and 'genes' files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pedg_df = make_pedigree(n_samples, n_sources, proband_ratio, seed)
+    genes = make_genes(seed=seed)
+    paths = {'variants': os.path.join(output_dir, f'variants.{output_format}'),
+             'metadata': os.path.join(output_dir, 'sample_metadata.xlsx'),
+             'genes': os.path.join(output_dir, 'dsd_genes.bed')}
+    pedg_df.to_excel(paths['metadata'], index=False)
+    genes.to_csv(paths['genes'], sep='\t', index=False)
+
+    intervals_per_chunk = max(1, WRITE_CHUNK // variants_per_interval)
+    writer = None
+    for part, first in enumerate(range(0, n_intervals, intervals_per_chunk)):
+        df = make_variants(min(intervals_per_chunk, n_intervals - first), variants_per_interval, pedg_df.ID,
+                           genes, missing, seed + part, first_interval=first)
+        if output_format == 'csv':
+            df.to_csv(paths['variants'], mode='w' if part == 0 else 'a', header=part == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            writer = writer or pq.ParquetWriter(paths['variants'], table.schema)
+            writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic cohort in the pipeline's layout.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--intervals', type=int, default=10_000)
+    parser.add_argument('--variants-per-interval', type=int, default=10)
+    parser.add_argument('--samples', type=int, default=100)
+    parser.add_argument('--sources', type=int, default=3)
+    parser.add_argument('--proband-ratio', type=float, default=0.5)
+    parser.add_argument('--missing', type=float, default=0.9, help="Fraction of missing genotypes.")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    paths = write_cohort(args.output_dir, args.intervals, args.variants_per_interval, args.samples, args.sources,
+                         args.proband_ratio, args.missing, args.format, args.seed)
+    for name, path in paths.items():
+        print(f"{name}: {path}")
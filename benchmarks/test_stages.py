@@ -0,0 +1,120 @@
+"""
+pytest-benchmark benchmarks of the hot peaks table stages on synthetic cohorts.
+
+For every scale point (number of variants) a synthetic cohort is written once with
+benchmarks/synthetic_cohort.py, and every stage of the pipeline is timed by
+pytest-benchmark and run once more under tracemalloc, whose peak traced memory is
+saved as the 'peak_mib' extra info of the benchmark:
+
+- read_csv: pd.read_csv of the variant CSV
+- bool_variant_df: hot_peaks_table.bool_variant_df
+- get_interval_stats: the legacy per-interval groupby(...).apply(get_interval_stats),
+  only up to LEGACY_MAX variants
+- get_all_interval_stats: the presence matrix and the vectorized statistics
+- add_dsd_distance: hot_peaks_table.add_dsd_distance
+- create_excel: the Excel export (xlsxwriter)
+
+The scale points go from 10k to 10M variants; the ones above the
+HOT_PEAKS_BENCHMARK_MAX_VARIANTS environment variable (default 100000) are skipped.
+The runs are saved and compared with a previous run by pytest-benchmark itself
+(--benchmark-autosave, --benchmark-compare).
+
+Usage:
+------
+HOT_PEAKS_BENCHMARK_MAX_VARIANTS=10000000 python -m pytest benchmarks/test_stages.py \
+    [--benchmark-group-by param:n_variants] [--benchmark-autosave] [--benchmark-compare]
+"""
+
+import os
+import sys
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import hot_peaks_table as hpt
+import bin.interval_stats as ist
+from bin.cohort_index import CohortIndex
+from bin.presence_matrix import PresenceMatrix
+from synthetic_cohort import write_cohort
+
+SCALES = [10_000, 100_000, 1_000_000, 10_000_000]
+MAX_VARIANTS_ENV = 'HOT_PEAKS_BENCHMARK_MAX_VARIANTS'
+DEFAULT_MAX_VARIANTS = 100_000
+LEGACY_MAX = 10_000
+N_SAMPLES = 100
+VARIANTS_PER_INTERVAL = 10
+ROUNDS = 3
+
+
+def get_interval_table(df, cohort):
+    """
+    The interval info table and vectorized statistics of a variant table.
+    """
+    matrix = PresenceMatrix.from_gt_frame(df)
+    stats = ist.get_all_interval_stats(matrix, df.INTERVAL_ID, cohort, backend='serial')
+    return pd.concat([hpt.get_info_table(df), stats], axis=1)
+
+
+@pytest.fixture(scope='module', params=SCALES, ids=lambda n_variants: f'n_variants={n_variants}')
+def n_variants(request):
+    if request.param > int(os.environ.get(MAX_VARIANTS_ENV, DEFAULT_MAX_VARIANTS)):
+        pytest.skip(f"{request.param} variants, above {MAX_VARIANTS_ENV}")
+    return request.param
+
+
+@pytest.fixture(scope='module')
+def cohort(n_variants, tmp_path_factory):
+    """
+    The files of a synthetic cohort of n_variants and the inputs of every stage.
+    """
+    output_dir = str(tmp_path_factory.mktemp(f'cohort_{n_variants}'))
+    paths = write_cohort(output_dir, max(1, n_variants // VARIANTS_PER_INTERVAL), VARIANTS_PER_INTERVAL, N_SAMPLES)
+    hpt.GENES_LOCATIONS_FILE = paths['genes']
+    df = pd.read_csv(paths['variants'], encoding='latin1')
+    cohort_index = CohortIndex.read_excel(paths['metadata'])
+    result = get_interval_table(df, cohort_index)
+    return {'paths': paths, 'output_dir': output_dir, 'df': df, 'cohort': cohort_index, 'result': result,
+            'added_result': hpt.add_dsd_distance(result.copy())}
+
+
+def run_benchmark(benchmark, func, *args):
+    # time ROUNDS runs of func, then save the peak traced memory of one more run
+    benchmark.pedantic(func, args=args, rounds=ROUNDS, iterations=1)
+    tracemalloc.start()
+    func(*args)
+    benchmark.extra_info['peak_mib'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+    tracemalloc.stop()
+
+
+def test_read_csv(benchmark, cohort):
+    run_benchmark(benchmark, lambda: pd.read_csv(cohort['paths']['variants'], encoding='latin1'))
+
+
+def test_bool_variant_df(benchmark, cohort):
+    run_benchmark(benchmark, hpt.bool_variant_df, cohort['df'])
+
+
+def test_get_interval_stats(benchmark, cohort, n_variants):
+    if n_variants > LEGACY_MAX:
+        pytest.skip(f"the legacy statistics only run up to {LEGACY_MAX} variants")
+    bool_df = hpt.bool_variant_df(cohort['df'])
+    run_benchmark(benchmark, lambda: bool_df.groupby('INTERVAL_ID').apply(hpt.get_interval_stats, cohort['cohort']))
+
+
+def test_get_all_interval_stats(benchmark, cohort):
+    run_benchmark(benchmark, get_interval_table, cohort['df'], cohort['cohort'])
+
+
+def test_add_dsd_distance(benchmark, cohort):
+    run_benchmark(benchmark, lambda: hpt.add_dsd_distance(cohort['result'].copy()))
+
+
+def test_create_excel(benchmark, cohort):
+    output_file = os.path.join(cohort['output_dir'], 'hot_peaks')
+    run_benchmark(benchmark, hpt.save_to_excel, cohort['added_result'], cohort['cohort'], output_file, None, ['xlsx'])
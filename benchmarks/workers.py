@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Scaling benchmark of the interval statistics across worker backends and counts.
+
+Builds a random packed presence matrix (no input files needed) and times
+`interval_stats.get_all_interval_stats` for every backend and worker count.
+
+Usage:
+------
+python benchmarks/workers.py [--variants N] [--samples N] [--intervals N] [--workers 1 2 4 ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bin.interval_stats as ist
+from bin.presence_matrix import PresenceMatrix
+
+
+def make_cohort(n_variants, n_samples, n_intervals, density, seed=0):
+    """
+    Random presence matrix, interval ids and pedigree of a synthetic cohort.
+    """
+    rng = np.random.default_rng(seed)
+    samples = [f"S{i}" for i in range(n_samples)]
+    matrix = PresenceMatrix.from_bool(rng.random((n_variants, n_samples)) < density, samples)
+    interval_ids = pd.Series(rng.integers(0, n_intervals, n_variants)).map('peak_{:07d}'.format)
+    pedg_df = pd.DataFrame({'ID': samples,
+                            'source': rng.choice(['source_a', 'source_b', 'source_c'], n_samples),
+                            'fam_relation': rng.choice([0, 1, 2], n_samples)})
+    return matrix, interval_ids, pedg_df
+
+
+def main(n_variants, n_samples, n_intervals, density, worker_counts, repeat):
+    matrix, interval_ids, pedg_df = make_cohort(n_variants, n_samples, n_intervals, density)
+    print(f"{n_variants:,} variants x {n_samples:,} samples, {n_intervals:,} intervals "
+          f"({matrix.nbytes / 2 ** 20:.1f} MiB packed)")
+    print(f"{'backend':<10}{'workers':>8}{'best [s]':>10}{'speedup':>9}")
+
+    serial = None
+    for backend in ('serial', 'thread', 'process'):
+        for workers in ([1] if backend == 'serial' else worker_counts):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ist.get_all_interval_stats(matrix, interval_ids, pedg_df, workers=workers, backend=backend)
+                times.append(time.perf_counter() - start)
+            serial = serial or min(times)
+            print(f"{backend:<10}{workers:>8}{min(times):>10.3f}{serial / min(times):>9.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time the interval statistics across worker counts.")
+    parser.add_argument('--variants', type=int, default=1_000_000)
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--intervals', type=int, default=100_000)
+    parser.add_argument('--density', type=float, default=0.05, help="Fraction of present genotypes.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.variants, args.samples, args.intervals, args.density, args.workers, args.repeat)
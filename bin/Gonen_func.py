@@ -2,11 +2,12 @@ import pandas as pd
 import numpy as np
 import os
 import subprocess
-import seaborn as sns
 import random
 import datetime
-from pandarallel import pandarallel
-pandarallel.initialize(progress_bar=False, nb_workers=8)
+import json
+
+# seaborn and pandarallel are imported on first use, see __generate_pastel_palette and init_parallel
+__parallel_settings = None
 
 DBXCLI_PATH = "~/dbxcli"
 
@@ -57,7 +58,28 @@ def download_from_dropbox(file_path_local,file_path_dropbox):
 
 
 
+## PARALLEL command ##
+
+def init_parallel(nb_workers=None, progress_bar=False):
+    """
+    Initialize pandarallel on first use (before calling parallel_apply).
+    nb_workers defaults to the number of CPUs.
+
+    Calling it again with the same settings does nothing, so every entry point can call
+    it without paying for the worker setup twice.
+    """
+    global __parallel_settings
+    nb_workers = nb_workers or os.cpu_count() or 1
+    settings = (nb_workers, progress_bar)
+    if __parallel_settings == settings:
+        return
+    from pandarallel import pandarallel
+    pandarallel.initialize(progress_bar=progress_bar, nb_workers=nb_workers)
+    __parallel_settings = settings
+
+
 def __generate_pastel_palette(n):
+    import seaborn as sns
     pastel_palette = sns.color_palette("pastel", n, as_cmap=True)
     return pastel_palette
 
@@ -77,11 +99,79 @@ def get_date(date_format="%d%m%y"):
     return current_date
 
 
-def create_excel(df, columns_dict, output_path, color_n=2, upload_path=None):
+EXCEL_ENGINES = ('styler', 'xlsxwriter')
+EXCEL_ROW_CHUNK = 10000
+# Excel's sheet row limit, minus the three header rows
+EXCEL_MAX_ROWS = 1048576 - 3
+
+
+def __write_excel_streaming(df, level_1_dict, output):
+    """
+    Write a DataFrame with (group, column) headers using xlsxwriter's constant_memory mode.
+
+    Every column group gets a single cell format and the rows are written in chunks,
+    group by group, so the export is linear in the table size with bounded memory.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'nan_inf_to_errors': True})
+    worksheet = workbook.add_worksheet()
+    header_format = workbook.add_format({'bold': True, 'align': 'center', 'border': 1})
+    group_formats = {k: workbook.add_format({'bg_color': v}) for k, v in level_1_dict.items()}
+
+    # (group, first column, last column) of every run of columns of the same group
+    groups = []
+    for i, group in enumerate(df.columns.get_level_values(0)):
+        if groups and groups[-1][0] == group:
+            groups[-1][2] = i
+        else:
+            groups.append([group, i, i])
+
+    # Header rows, laid out like DataFrame.to_excel: groups, column names, index name
+    for group, first, last in groups:
+        if first == last:
+            worksheet.write(0, first + 1, group, header_format)
+        else:
+            worksheet.merge_range(0, first + 1, 0, last + 1, group, header_format)
+    worksheet.write_row(1, 1, df.columns.get_level_values(1).tolist(), header_format)
+    worksheet.write(2, 0, df.index.name, header_format)
+
+    row = 3
+    for start in range(0, df.shape[0], EXCEL_ROW_CHUNK):
+        chunk = df.iloc[start:start + EXCEL_ROW_CHUNK].astype(object)
+        values = chunk.where(chunk.notna(), None).values.tolist()
+        for index, line in zip(chunk.index, values):
+            worksheet.write(row, 0, index, header_format)
+            for group, first, last in groups:
+                worksheet.write_row(row, first + 1, line[first:last + 1], group_formats[group])
+            row += 1
+
+    workbook.close()
+
+
+def __group_columns(df, columns_dict):
     # Generate mini DataFrames based on columns_dict
     cur_dict = {i: __create_mini_df(df, columns_dict[i]) for i in columns_dict.keys()}
     # Concatenate mini DataFrames horizontally
-    df = pd.concat(cur_dict, axis=1)
+    return pd.concat(cur_dict, axis=1)
+
+
+def create_excel(df, columns_dict, output_path, color_n=2, upload_path=None, engine='styler', max_rows=None):
+    """
+    Save the columns of columns_dict to an Excel file, grouped and coloured by their keys.
+
+    Parameters:
+        engine (str): 'styler' styles the table with the pandas Styler and returns it,
+            'xlsxwriter' streams it with one format per column group and returns the table.
+        max_rows (int): Keep only the first max_rows rows (e.g. EXCEL_MAX_ROWS). Defaults to all rows.
+    """
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unknown Excel engine {engine}, expected one of {EXCEL_ENGINES}")
+
+    df = __group_columns(df, columns_dict)
+    if max_rows is not None and df.shape[0] > max_rows:
+        print(f"The Excel file keeps only the first {max_rows:,} of {df.shape[0]:,} rows.")
+        df = df.iloc[:max_rows]
     
     # Generate a pastel color palette
     pastel_palette = __generate_pastel_palette(color_n)
@@ -89,30 +179,136 @@ def create_excel(df, columns_dict, output_path, color_n=2, upload_path=None):
     # Create a dictionary to assign colors to level 1 columns
     level_1_dict = {list(columns_dict.keys())[i]: pastel_palette[i % color_n] for i in range(len(columns_dict.keys()))}
     
-    color_dict = {}
-    i = 0
-    
-    # Assign colors based on the level 1 column values
-    for k, v in df.columns:
-        color_dict.update({v: f"background-color: {level_1_dict[k]}"})
-
-    # Define a function to apply color styling
-    def mycolor(x):
-        return pd.Series(color_dict)
-    
     # Generate the output filename using the current date
     output = f"{output_path}_{get_date()}.xlsx"
-    
-    # Apply color styling and save DataFrame to an Excel file
-    styled = df.style.apply(mycolor, axis=1)
     create_folders_if_not_exist(output)
-    styled.to_excel(output)
+
+    if engine == 'xlsxwriter':
+        __write_excel_streaming(df, level_1_dict, output)
+        result = df
+    else:
+        color_dict = {}
+
+        # Assign colors based on the level 1 column values
+        for k, v in df.columns:
+            color_dict.update({v: f"background-color: {level_1_dict[k]}"})
+
+        # Define a function to apply color styling
+        def mycolor(x):
+            return pd.Series(color_dict)
+
+        # Apply color styling and save DataFrame to an Excel file
+        result = df.style.apply(mycolor, axis=1)
+        result.to_excel(output)
     
     # Upload the file to Dropbox if upload_path is provided
     if upload_path is not None:
         upload_to_dropbox(output, upload_path)
-    return styled
+    return result
+
+
 
+## TABLE command ##
+
+OUTPUT_FORMATS = ('xlsx', 'parquet', 'feather', 'tsv.gz')
+COLUMN_GROUPS_KEY = b'column_groups'
+
+
+def create_table_file(df, columns_dict, output_path, output_format, upload_path=None):
+    """
+    Save the columns of columns_dict to a Parquet, Feather or gzipped TSV file.
+
+    Parquet and Feather files hold one column per table column (no row limit), and the
+    column groups of columns_dict are kept as JSON in the schema metadata under
+    COLUMN_GROUPS_KEY, see `read_table_file`. The TSV keeps them as a second header row.
+
+    Parameters:
+        df (pd.DataFrame): The table to save.
+        columns_dict (dict): Group name -> the columns of the group.
+        output_path (str): Output path, without the date and extension.
+        output_format (str): 'parquet', 'feather' or 'tsv.gz'.
+        upload_path (str): Path for uploading the file (optional).
+
+    Returns:
+        str: Path of the saved file.
+    """
+    output = f"{output_path}_{get_date()}.{output_format}"
+    create_folders_if_not_exist(output)
+    grouped = __group_columns(df, columns_dict)
+
+    if output_format == 'tsv.gz':
+        grouped.to_csv(output, sep='\t', compression='gzip')
+    elif output_format in ('parquet', 'feather'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.feather as feather
+
+        groups = {}
+        for group, column in grouped.columns:
+            groups.setdefault(group, []).append(column)
+        flat = grouped.droplevel(0, axis=1)
+        flat = flat.loc[:, ~flat.columns.duplicated()]
+
+        table = pa.Table.from_pandas(flat, preserve_index=True)
+        metadata = dict(table.schema.metadata or {})
+        metadata[COLUMN_GROUPS_KEY] = json.dumps(groups).encode()
+        table = table.replace_schema_metadata(metadata)
+        if output_format == 'parquet':
+            pq.write_table(table, output)
+        else:
+            feather.write_feather(table, output)
+    else:
+        raise ValueError(f"Unknown output format {output_format}, expected one of {OUTPUT_FORMATS}")
+
+    if upload_path is not None:
+        upload_to_dropbox(output, upload_path)
+    return output
+
+
+def read_table_file(path):
+    """
+    Read a Parquet / Feather / gzipped TSV file saved by `create_table_file`, with its column groups.
+
+    Parameters:
+        path (str): Path to the file.
+
+    Returns:
+        pd.DataFrame: The table, with (group, column) MultiIndex columns.
+    """
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+
+    if path.endswith('.tsv.gz'):
+        return pd.read_csv(path, sep='\t', header=[0, 1], index_col=0, compression='gzip')
+
+    table = pq.read_table(path) if path.endswith('.parquet') else feather.read_table(path)
+    groups = json.loads(table.schema.metadata[COLUMN_GROUPS_KEY])
+    df = table.to_pandas()
+    return pd.concat({group: df[columns] for group, columns in groups.items()}, axis=1)
+
+
+def create_tables(df, columns_dict, output_path, output_formats=('xlsx',), color_n=2, upload_path=None,
+                  engine='xlsxwriter'):
+    """
+    Save the table in every requested output format.
+
+    The Excel file is a summary view capped at EXCEL_MAX_ROWS rows; the other formats
+    keep every row.
+
+    Parameters:
+        df (pd.DataFrame): The table to save.
+        columns_dict (dict): Group name -> the columns of the group.
+        output_path (str): Output path, without the date and extension.
+        output_formats (list): Formats out of OUTPUT_FORMATS.
+        color_n (int): Number of colors for the Excel column groups (optional).
+        upload_path (str): Path for uploading the files (optional).
+        engine (str): Excel engine, see `create_excel`.
+    """
+    for output_format in output_formats:
+        if output_format == 'xlsx':
+            create_excel(df, columns_dict, output_path, color_n, upload_path, engine=engine, max_rows=EXCEL_MAX_ROWS)
+        else:
+            create_table_file(df, columns_dict, output_path, output_format, upload_path)
 
 
 def create_folders_if_not_exist(file_path):
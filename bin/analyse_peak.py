@@ -3,11 +3,17 @@ This script take a variant DF and output peak analysis.
 note that the script does not filterring the table. hence the input should be filtered
 
 """
+import sys
 import numpy as np
 import pandas as pd
-from pandarallel import pandarallel
-pandarallel.initialize(progress_bar=True, nb_workers=8)
 import Gonen_func
+import genotypes
+
+SAMPLE_FILE_IDX = 1
+PEDG_PATH_IDX = 2
+OUTPUT_PATH_IDX = 3
+UPLOAD_PATH_IDX = 4
+ARG_MAX_NUM = 5
 
 
 def get_interval_stats(df_in, pedg_df):
@@ -35,7 +41,12 @@ def bool_variant_df(df):
     returns a boolean table of samples VS variants.
     True if the variant exist in the sample.
     """
-    gt = df[[i for i in df.columns if i.endswith('GT')]].replace(' ',np.nan).replace('',np.nan).notna()
+    gt = df[[i for i in df.columns if i.endswith('GT')]]
+    if all(pd.api.types.is_integer_dtype(gt[i]) for i in gt.columns):
+        ## GT codes written by clean_tsv.py
+        gt = gt != genotypes.GT_MISSING
+    else:
+        gt = gt.replace(' ',np.nan).replace('',np.nan).notna()
     gt.columns = [i.replace(':GT','') for i in gt.columns ]
 
     return pd.concat([df[['INTERVAL_ID']],gt], axis=1)
@@ -76,6 +87,7 @@ def main(sample_file_path, pedg_path, output_file, upload_path=""):
     ## getting a table that tells if a sample have variant or not
     peak_df = bool_variant_df(df)
     ## getting the data on each interval
+    Gonen_func.init_parallel(progress_bar=True)
     peak_df = peak_df.groupby('INTERVAL_ID').parallel_apply(lambda x: get_interval_stats(x,pedg_df))
     ## adding adtional peak info 
     result  = pd.concat([get_info_table(df),peak_df],axis=1)
@@ -92,7 +104,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     sample_file_path = sys.argv[SAMPLE_FILE_IDX]
-    pedg_path = sys.argv[SAMPLE_FILE_IDX]
+    pedg_path = sys.argv[PEDG_PATH_IDX]
     output_file = sys.argv[OUTPUT_PATH_IDX]
     upload_path = sys.argv[UPLOAD_PATH_IDX] if len(sys.argv) >= ARG_MAX_NUM else ""
 
@@ -0,0 +1,178 @@
+"""
+Sparse genotype carrier matrix.
+
+In the filtered hot peak variant tables almost every ':GT' cell is empty, so the
+"which samples carry this variant" table is stored as CSR lists of carrier sample
+positions per variant, built straight from the non-missing GT cells. Memory and
+the interval statistics (see `interval_stats.interval_stats_from_carriers`) then
+scale with the number of carriers instead of variants x samples.
+"""
+
+import numpy as np
+import pandas as pd
+
+from bin.presence_matrix import GT_SUFFIX, ROW_CHUNK, arrow_gt_presence, get_gt_columns, gt_presence
+
+
+class CarrierMatrix:
+    """
+    Variants x samples presence in CSR form.
+
+    The carriers of variant i are the samples at indices[indptr[i]:indptr[i + 1]],
+    in increasing sample order.
+    """
+
+    def __init__(self, indptr, indices, samples):
+        self.indptr = indptr
+        self.indices = indices
+        self.samples = pd.Index(samples)
+
+    @classmethod
+    def from_coo(cls, rows, cols, n_variants, samples):
+        """
+        Build the matrix from (variant, sample) carrier pairs in any order.
+
+        Parameters:
+            rows (ndarray): Variant row of every carrier.
+            cols (ndarray): Sample position of every carrier.
+            n_variants (int): Number of variants.
+            samples (list): Sample names.
+
+        Returns:
+            CarrierMatrix: The CSR matrix.
+        """
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n_variants + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_variants), out=indptr[1:])
+        return cls(indptr, np.asarray(cols, dtype=np.int32)[order], samples)
+
+    @classmethod
+    def from_gt_frame(cls, df, chunksize=ROW_CHUNK):
+        """
+        Build the carrier matrix from the ':GT' columns of a variant dataframe.
+
+        The genotype block is tested ROW_CHUNK rows at a time and only the carriers
+        are kept, so the full boolean table is never materialized.
+
+        Parameters:
+            df (DataFrame): Input dataframe containing variant information.
+            chunksize (int): Number of rows tested at a time.
+
+        Returns:
+            CarrierMatrix: Carriers of every variant.
+        """
+        gt_columns = get_gt_columns(df.columns)
+        positions = [df.columns.get_loc(i) for i in gt_columns]
+        samples = [i.replace(GT_SUFFIX, '') for i in gt_columns]
+        is_coded = all(pd.api.types.is_integer_dtype(df[i]) for i in gt_columns)
+
+        counts, indices = [], []
+        for start in range(0, df.shape[0], chunksize):
+            block = df.iloc[start:start + chunksize, positions]
+            present = gt_presence(block.to_numpy() if is_coded else block.to_numpy(dtype=object))
+            # row-major nonzero: carriers grouped by variant, samples in order
+            _, cols = np.nonzero(present)
+            counts.append(present.sum(axis=1))
+            indices.append(cols.astype(np.int32))
+
+        indptr = np.zeros(df.shape[0] + 1, dtype=np.int64)
+        if counts:
+            np.cumsum(np.concatenate(counts), out=indptr[1:])
+        return cls(indptr, np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32), samples)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """
+        Build the carrier matrix from the ':GT' columns of an Arrow table.
+
+        Parameters:
+            table (pyarrow.Table): Variant table with the ':GT' columns.
+
+        Returns:
+            CarrierMatrix: Carriers of every variant.
+        """
+        gt_columns = get_gt_columns(table.column_names)
+        samples = [i.replace(GT_SUFFIX, '') for i in gt_columns]
+
+        rows = [np.flatnonzero(arrow_gt_presence(table.column(name))) for name in gt_columns]
+        cols = [np.full(len(i), j, dtype=np.int32) for j, i in enumerate(rows)]
+        if not rows:
+            return cls(np.zeros(table.num_rows + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), samples)
+        return cls.from_coo(np.concatenate(rows), np.concatenate(cols), table.num_rows, samples)
+
+    @classmethod
+    def from_presence(cls, matrix, chunksize=ROW_CHUNK):
+        """
+        Convert a packed PresenceMatrix to carrier lists.
+        """
+        rows, cols = [], []
+        for start in range(0, matrix.n_variants, chunksize):
+            chunk_rows, chunk_cols = np.nonzero(matrix.to_bool(start, start + chunksize))
+            rows.append(chunk_rows + start)
+            cols.append(chunk_cols)
+        if not rows:
+            return cls(np.zeros(matrix.n_variants + 1, dtype=np.int64), np.zeros(0, dtype=np.int32), matrix.samples)
+        return cls.from_coo(np.concatenate(rows), np.concatenate(cols), matrix.n_variants, matrix.samples)
+
+    @property
+    def n_variants(self):
+        return len(self.indptr) - 1
+
+    @property
+    def n_samples(self):
+        return len(self.samples)
+
+    @property
+    def shape(self):
+        return self.n_variants, self.n_samples
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
+
+    def to_coo(self):
+        """
+        Get the (variant, sample) pairs of the carriers.
+
+        Returns:
+            tuple: (rows, cols) arrays of the variant row and sample position of every carrier.
+        """
+        rows = np.repeat(np.arange(self.n_variants), np.diff(self.indptr))
+        return rows, self.indices
+
+    def to_bool(self):
+        """
+        Expand the matrix to a dense boolean variants x samples matrix.
+        """
+        values = np.zeros(self.shape, dtype=bool)
+        values[self.to_coo()] = True
+        return values
+
+    def variant_counts(self, mask=None):
+        """
+        Count the carriers of every variant.
+
+        Parameters:
+            mask (array-like, optional): Boolean sample mask to count only some samples.
+
+        Returns:
+            ndarray: int64 number of carrier samples per variant.
+        """
+        if mask is None:
+            return np.diff(self.indptr)
+        rows, cols = self.to_coo()
+        selected = np.asarray(mask, dtype=bool)[cols]
+        return np.bincount(rows[selected], minlength=self.n_variants)
+
+    def sample_counts(self):
+        """
+        Count the variants of every sample.
+
+        Returns:
+            Series: Number of variants carried by each sample.
+        """
+        return pd.Series(np.bincount(self.indices, minlength=self.n_samples), index=self.samples)
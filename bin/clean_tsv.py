@@ -1,12 +1,33 @@
 #!/usr/bin/env python
 
-import sys
+import argparse
+import re
 import pandas as pd
 import numpy as np
 
+from genotypes import GT_HET, GT_HOM_ALT, GT_MISSING, GT_PHASED, GT_REF
+from merge_chrom import CHROMOSOMES
+
 NULL_STRING = ' '
 NULL_INT = -1
 
+# Labels of the genotype codes of the cleaned ':GT' columns (see genotypes.py)
+GT_LABELS = {GT_MISSING: NULL_STRING, GT_REF: '0/0', GT_HET: '0/1', GT_HOM_ALT: '1/1',
+             GT_PHASED | GT_REF: '0|0', GT_PHASED | GT_HET: '0|1', GT_PHASED | GT_HOM_ALT: '1|1'}
+GT_ENCODING_KEY = b'gt_encoding'
+GT_ENCODING = b'int8:missing=0,ref=1,het=2,hom_alt=3,phased=+4'
+
+# DP/GQ are stored as nullable uint16, larger values are clipped
+SCORE_MAX = np.iinfo(np.uint16).max
+# rows per Parquet row group: a few intervals' worth of sorted variants per group
+ROW_GROUP_SIZE = 64 * 1024
+SORT_COLUMNS = ['CHROM', 'POS', 'REF', 'ALT']
+# the merge orders the rows by chromosome rank and POS (SORT_KEY), then REF and ALT
+SORT_KEY = '_sort_key'
+MERGE_COLUMNS = [SORT_KEY, 'REF', 'ALT']
+# the non-sample columns that aren't text; the merge reads all the others as str
+NUMERIC_COLUMNS = ['POS', 'AF', 'AF_popmax', 'GH_is_elite', 'from', 'to', 'length']
+
 def concat_csv_files(csv_files):
     dfs = []  # List to store individual DataFrames from each CSV file
 
@@ -20,25 +41,182 @@ def concat_csv_files(csv_files):
 
     
     # Sort the concatenated DataFrame by CHROM, POS, REF, and ALT
-    concatenated_df.sort_values(by=['CHROM', 'POS', 'REF', 'ALT'], inplace=True)
+    concatenated_df.sort_values(by=SORT_COLUMNS, inplace=True)
 
     return concatenated_df
 
 
+def __sort_keys(df):
+    # chromosome rank (CHROMOSOMES order, as merge_chrom writes them) << 32 | POS of every row
+    ranks = pd.Index(CHROMOSOMES).get_indexer(df.CHROM)
+    if np.any(ranks < 0):
+        raise ValueError(f"unknown chromosome {df.CHROM[ranks < 0].iloc[0]}")
+    return ranks.astype(np.int64) << 32 | df.POS.to_numpy(dtype=np.int64)
+
+
+def __read_sorted_chunks(csv_file, chunksize, dtype):
+    # chunks of a sorted TSV with their sort keys, checking that the keys never decrease
+    last_key = np.iinfo(np.int64).min
+    for chunk in pd.read_csv(csv_file, sep='\t', chunksize=chunksize, dtype=dtype):
+        keys = __sort_keys(chunk)
+        if np.any(np.diff(keys) < 0) or keys[0] < last_key:
+            raise ValueError(f"{csv_file} is not sorted by chromosome and POS")
+        last_key = keys[-1]
+        yield chunk.assign(**{SORT_KEY: keys})
+
+
+def __rows_up_to(df, key):
+    # number of leading rows of the sorted df whose (sort key, REF, ALT) is <= key
+    less = np.zeros(df.shape[0], dtype=bool)
+    equal = np.ones(df.shape[0], dtype=bool)
+    for col, value in zip(MERGE_COLUMNS, key):
+        less |= equal & (df[col] < value).to_numpy()
+        equal &= (df[col] == value).to_numpy()
+    return int((less | equal).sum())
+
+
+def __text_dtypes(csv_file):
+    # str dtype of the non-sample, non-numeric columns of a TSV header
+    header = pd.read_csv(csv_file, sep='\t', nrows=0).columns
+    return {col: str for col in header if ':' not in col and col not in NUMERIC_COLUMNS}
+
+
+def merge_sorted_csv_files(csv_files, output_file, chunksize=ROW_GROUP_SIZE):
+    """
+    Merge TSV files that are each sorted by chromosome and POS into one cleaned Parquet file.
+
+    A streaming k-way merge: every input is read chunksize rows at a time, and all the
+    buffered rows up to the smallest last key among the buffers (no unread row can come
+    before it) are sorted, cleaned with `replace_missing_values` and written as a row
+    group. Memory is bounded by about one chunk per input, and writing starts with the
+    first chunks. The chromosomes are ordered as CHROMOSOMES (chr2 before chr10) and the
+    rows of a position by REF and ALT; an input that is not sorted by chromosome and POS
+    raises a ValueError. The inputs must have the same columns. The text columns are
+    read as str and written as strings, even when the first rows have none of their values.
+
+    Parameters:
+        csv_files (list): Paths of the sorted TSV files.
+        output_file (str): Path of the Parquet file.
+        chunksize (int): Rows read from an input at a time.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    text_dtypes = [__text_dtypes(file) for file in csv_files]
+    readers = [__read_sorted_chunks(file, chunksize, dtypes) for file, dtypes in zip(csv_files, text_dtypes)]
+    buffers = [next(reader, None) for reader in readers]
+    writer = None
+
+    while any(buffer is not None for buffer in buffers):
+        active = [i for i, buffer in enumerate(buffers) if buffer is not None]
+        bound = min(tuple(buffers[i][MERGE_COLUMNS].iloc[-1]) for i in active)
+
+        ready = []
+        for i in active:
+            n_ready = __rows_up_to(buffers[i], bound)
+            ready.append(buffers[i].iloc[:n_ready])
+            buffers[i] = buffers[i].iloc[n_ready:]
+            if buffers[i].empty:
+                buffers[i] = next(readers[i], None)
+
+        part = pd.concat(ready, ignore_index=True).sort_values(by=MERGE_COLUMNS, kind='stable')
+        part = replace_missing_values(part.drop(columns=SORT_KEY))
+        table = __arrow_table(part)
+        if writer is None:
+            # an all-missing text column of the first part is null typed, fix the text columns as strings
+            schema = table.schema
+            for col in text_dtypes[0]:
+                schema = schema.set(schema.get_field_index(col), pa.field(col, pa.string()))
+            writer = pq.ParquetWriter(output_file, schema, use_dictionary=__text_columns(schema))
+        table = table.cast(writer.schema)
+        writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+
+    if writer is not None:
+        writer.close()
+
+
+
+
+
+def __numeric_block(df, columns):
+    # 2-D block of the columns as float, with NaN for '.', ' ' and other non-numbers
+    block = df[columns].to_numpy()
+    if block.dtype == object:
+        block = pd.to_numeric(block.ravel(), errors='coerce').reshape(block.shape)
+    return block.astype('float64')
+
+
+def encode_gt(gt):
+    """
+    Encode a genotype string as a GT code.
 
+    Calls with no called allele are GT_MISSING, all-reference calls GT_REF, calls with
+    a single alternate allele (including haploid calls) GT_HOM_ALT and any other mix
+    (e.g. '0/1', '1/2', './1') GT_HET. Phased calls add GT_PHASED.
+
+    Parameters:
+        gt (str): Genotype, e.g. '0/1' or '1|1'.
+
+    Returns:
+        int: The GT code.
+    """
+    alleles = re.split(r'[/|]', str(gt).strip())
+    called = {i for i in alleles if i not in ('', '.')}
+    if not called:
+        return GT_MISSING
+    if called == {'0'}:
+        code = GT_REF
+    elif len(called) == 1 and len(called) == len(set(alleles)):
+        code = GT_HOM_ALT
+    else:
+        code = GT_HET
+    return code | GT_PHASED if '|' in str(gt) else code
+
+
+def normalize_sample_columns(df):
+    """
+    Normalize all the sample columns (':GT', ':DP', ':GQ') as 2-D blocks.
+
+    Genotypes are stored as int8 GT codes (see `encode_gt`), with missing genotypes
+    ('.', './.', '.|.', NaN) as GT_MISSING. DP and GQ become nullable uint16, missing
+    (<NA>) where they are not numbers or the genotype is hom-ref.
+
+    Returns:
+        dict: Column name -> normalized column, for every sample column.
+    """
+    samples = list(dict.fromkeys(i.split(':')[0] for i in df.columns if ':' in i))
+    gt_col = [f"{i}:GT" for i in samples]
+    score_col = [f"{i}:{field}" for field in ('DP', 'GQ') for i in samples]
+
+    gt = df[gt_col].to_numpy(dtype=object)
+    ref_index = (gt == '0/0') | (gt == '0|0')
+    missing = pd.isna(gt)
+    for null in ('.', './.', '.|.'):
+        missing |= gt == null
+    gt[missing] = NULL_STRING
+    # encode each distinct genotype string once
+    gt_codes, gt_values = pd.factorize(gt.ravel())
+    gt_lookup = np.array([encode_gt(i) for i in gt_values], dtype=np.int8)
+    gt_codes = gt_lookup[gt_codes].reshape(gt.shape)
+
+    # hom-ref calls don't keep their DP and GQ (both blocks are samples-ordered)
+    scores = __numeric_block(df, score_col)
+    scores[np.concatenate([ref_index, ref_index], axis=1)] = np.nan
+    scores = np.clip(scores, 0, SCORE_MAX)
+    scores = pd.DataFrame(scores, columns=score_col, index=df.index).astype('UInt16')
+
+    columns = {col: gt_codes[:, j] for j, col in enumerate(gt_col)}
+    columns.update({col: scores[col] for col in score_col})
+    return columns
 
 
 def replace_missing_values(df_in):
-    df = df_in.copy()
-    sample_col = [i.split(':')[0] for i in df.columns if ':' in i]
-    
+    sample_columns = normalize_sample_columns(df_in)
+    df = pd.DataFrame({col: sample_columns[col] if col in sample_columns else df_in[col] for col in df_in.columns},
+                      index=df_in.index)
+
     replacement_dict = {'.': NULL_STRING, './.': NULL_STRING, '.|.': NULL_STRING, np.nan: NULL_STRING, None: NULL_STRING}
     int_replace_dict = {'.':NULL_INT, np.nan:NULL_INT,None:NULL_INT, NULL_STRING:NULL_INT}
-    for i in sample_col:
-        ref_index = (df[f"{i}:GT"] == '0/0') |  (df[f"{i}:GT"] == '0|0') 
-        df.loc[df.index[ref_index],[f'{i}:DP',f'{i}:GQ']] = NULL_STRING
-        df[[f'{i}:DP',f'{i}:GQ']] = df[[f'{i}:DP',f'{i}:GQ']].replace(int_replace_dict).astype(int) 
-        df[f'{i}:GT'] = df[f'{i}:GT'].replace(replacement_dict).astype(str)  
         
     float_col =  ['AF','AF_popmax']
     df[float_col] = df[float_col].replace(int_replace_dict).astype("float64")
@@ -55,6 +233,39 @@ def replace_missing_values(df_in):
     
 
     
+def write_parquet(df, output_file, row_group_size=ROW_GROUP_SIZE):
+    """
+    Write a cleaned variant table to Parquet.
+
+    The text columns are dictionary encoded, the rows (sorted by CHROM and POS) are
+    split into row groups of row_group_size so interval scans can skip groups by their
+    POS statistics, and the GT encoding is recorded in the schema metadata.
+
+    Parameters:
+        df (DataFrame): Cleaned variant table, as returned by `replace_missing_values`.
+        output_file (str): Path of the Parquet file.
+        row_group_size (int): Rows per row group.
+    """
+    import pyarrow.parquet as pq
+
+    table = __arrow_table(df)
+    pq.write_table(table, output_file, row_group_size=row_group_size, use_dictionary=__text_columns(table.schema))
+
+
+def __arrow_table(df):
+    # Arrow table of a cleaned variant table, with the GT encoding in its schema metadata
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), GT_ENCODING_KEY: GT_ENCODING})
+
+
+def __text_columns(schema):
+    import pyarrow as pa
+
+    return [field.name for field in schema if pa.types.is_string(field.type)]
+
+
 def check_table(input_file):
         # Read the TSV file into a pandas DataFrame
     df = pd.read_csv(input_file, sep='\t')
@@ -65,17 +276,22 @@ def check_table(input_file):
     
     
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Error: No input file provided.")
-        print("Usage: python script_name.py input_file.tsv")
-        sys.exit(1)
-
-    input_files = sys.argv[2:]
-    output_name =  sys.argv[1]
-    df = concat_csv_files(input_files)
-    print('done concat')
-    df = replace_missing_values(df)
-    print('saving')
-    df.to_parquet(f'{output_name}.parquet')
+    parser = argparse.ArgumentParser(description="Concatenate and clean variant TSV files into a Parquet file.")
+    parser.add_argument('output_name', help="Output name, '.parquet' is added.")
+    parser.add_argument('input_files', nargs='+', help="Variant TSV files.")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Stream a k-way merge of the inputs, reading this many rows at a time. "
+                             "Every input must already be sorted by CHROM, POS, REF and ALT.")
+    args = parser.parse_args()
+
+    input_files = args.input_files
+    output_name = args.output_name
+    if args.chunksize:
+        merge_sorted_csv_files(input_files, f'{output_name}.parquet', args.chunksize)
+    else:
+        df = concat_csv_files(input_files)
+        print('done concat')
+        df = replace_missing_values(df)
+        print('saving')
+        write_parquet(df, f'{output_name}.parquet')
     print(f"Parquet file '{output_name}.parquet' created successfully!")
-    
@@ -0,0 +1,197 @@
+"""
+Precomputed sample groups of the pedigree.
+
+The interval statistics, the column group headers and the export only need, for
+every sample, its source (cohort) and whether it is a proband. `CohortIndex` reads
+that once from the sample metadata sheet (ID, source, fam_relation) into integer
+arrays, so the per-interval work is array indexing and the pedigree DataFrame is
+not filtered again for every interval or source.
+
+The optional family column gives the proband / mother / father rows of every
+trio the same way, for the segregation counts (see bin/segregation.py).
+"""
+
+import numpy as np
+import pandas as pd
+
+PROBAND_RELATION = 0
+# the family of every sample and the parents' fam_relation codes, for the trios
+FAMILY_COLUMN = 'family'
+MOTHER_RELATION = 1
+FATHER_RELATION = 2
+
+
+class CohortIndex:
+    """
+    Read-only sample groups of a pedigree.
+
+    Attributes:
+        ids (ndarray): Sample IDs (str), in pedigree row order.
+        labels (tuple): The sources, in order of appearance.
+        source_codes (ndarray): Position in labels of every pedigree row (-1 for no source).
+        is_proband (ndarray): Whether every pedigree row is a proband (fam_relation 0).
+        source_positions (tuple): Pedigree rows of every source, in label order.
+        proband_positions (ndarray): Pedigree rows of the probands.
+        trios (ndarray): (n_trios, 3) pedigree rows of the proband, mother and father of every
+            proband with a family (-1 for a parent that isn't in the pedigree).
+    """
+
+    __slots__ = ('ids', 'labels', 'source_codes', 'is_proband', 'source_positions', 'proband_positions', 'trios',
+                 '_sample_ids', '_sample_groups')
+
+    def __init__(self, ids, sources, is_proband, families=None, relations=None):
+        """
+        Parameters:
+            ids (array-like): Sample ID of every pedigree row.
+            sources (array-like): Source of every pedigree row.
+            is_proband (array-like): Whether every pedigree row is a proband.
+            families (array-like, optional): Family of every pedigree row, for the trios.
+            relations (array-like, optional): fam_relation of every pedigree row, for the trios.
+        """
+        sources = pd.Series(sources, dtype=object)
+        source_codes, labels = pd.factorize(sources, use_na_sentinel=False)
+        # a missing source is still a (empty) label of the table, but has no samples
+        source_codes[sources.isna().to_numpy()] = -1
+        is_proband = np.asarray(is_proband, dtype=bool)
+        values = {
+            'ids': np.asarray(pd.Series(ids).astype(str), dtype=object),
+            'labels': tuple(labels),
+            'source_codes': source_codes.astype(np.int32),
+            'is_proband': is_proband,
+            'source_positions': tuple(np.flatnonzero(source_codes == i) for i in range(len(labels))),
+            'proband_positions': np.flatnonzero(is_proband),
+            'trios': self.__get_trios(is_proband, families, relations),
+        }
+
+        # the groups of every distinct ID: a sample listed in several rows is in all their groups
+        id_codes, sample_ids = pd.factorize(values['ids'])
+        row_groups = np.zeros((len(id_codes), 1 + 2 * len(labels)), dtype=bool)
+        row_groups[:, 0] = is_proband
+        has_source = source_codes >= 0
+        row_groups[np.flatnonzero(has_source), 1 + 2 * source_codes[has_source]] = True
+        sample_groups = np.zeros((len(sample_ids), row_groups.shape[1]), dtype=bool)
+        np.logical_or.at(sample_groups, id_codes, row_groups)
+        # probands of a source: in the source and a proband in any row
+        sample_groups[:, 2::2] = sample_groups[:, 1::2] & sample_groups[:, [0]]
+        values['_sample_ids'] = pd.Index(sample_ids)
+        values['_sample_groups'] = sample_groups
+
+        for name, value in values.items():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            for array in value if isinstance(value, tuple) else ():
+                if isinstance(array, np.ndarray):
+                    array.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    @staticmethod
+    def __get_trios(is_proband, families, relations):
+        # pedigree rows of the probands with a family and of their parents (the first listed of each)
+        if families is None or relations is None:
+            return np.zeros((0, 3), dtype=np.int64)
+        families = pd.Series(np.asarray(families, dtype=object))
+        relations = np.asarray(relations)
+        probands = np.flatnonzero(is_proband & families.notna().to_numpy())
+
+        trios = [probands]
+        for relation in (MOTHER_RELATION, FATHER_RELATION):
+            parents = np.flatnonzero((relations == relation) & families.notna().to_numpy())
+            parent_families = families.iloc[parents]
+            first = ~parent_families.duplicated().to_numpy()
+            found = pd.Index(parent_families[first]).get_indexer(families.iloc[probands])
+            trios.append(np.append(parents[first], -1)[found])  # found -1: no such parent
+        return np.column_stack(trios).astype(np.int64)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} samples, {len(self.proband_positions)} probands, " \
+               f"sources={list(self.labels)})"
+
+    @classmethod
+    def from_pedigree(cls, pedg_df):
+        """
+        Build the index of a pedigree dataframe.
+
+        Parameters:
+            pedg_df (DataFrame): Pedigree with the ID, source and fam_relation columns, and optionally
+                FAMILY_COLUMN for the trios.
+
+        Returns:
+            CohortIndex: The sample groups.
+        """
+        families = pedg_df[FAMILY_COLUMN] if FAMILY_COLUMN in pedg_df else None
+        return cls(pedg_df.ID, pedg_df.source, (pedg_df.fam_relation == PROBAND_RELATION).to_numpy(), families,
+                   pedg_df.fam_relation.to_numpy())
+
+    @classmethod
+    def read_excel(cls, path):
+        """
+        Build the index of a sample metadata Excel file.
+        """
+        return cls.from_pedigree(pd.read_excel(path))
+
+    def group_masks(self, samples):
+        """
+        Build the sample membership masks of the proband and source groups.
+
+        Parameters:
+            samples (Index): Sample names, in the column order of the variant table.
+
+        Returns:
+            tuple: (labels, masks) where labels are the sources in order of appearance and
+            masks is a (n_samples, 1 + 2 * n_labels) boolean matrix whose columns are
+            [probands, label_1, label_1 probands, label_2, ...]. Samples that are not in
+            the pedigree are in no group.
+        """
+        positions = self._sample_ids.get_indexer(pd.Index(samples).astype(str))
+        masks = self._sample_groups[positions]
+        masks[positions < 0] = False
+        return list(self.labels), masks
+
+    def trio_columns(self, samples):
+        """
+        Get the sample columns of the trios whose proband is in a variant table.
+
+        Parameters:
+            samples (Index): Sample names, in the column order of the variant table.
+
+        Returns:
+            tuple: (probands, mothers, fathers, sources) arrays with an entry per trio: the
+            column of its proband, mother and father (-1 for a parent that isn't in the
+            table) and the label position of the proband's source (-1 for none).
+        """
+        columns = pd.Index(samples).astype(str).get_indexer(self.ids)
+        columns = np.append(columns, -1)  # pedigree row -1 (no parent) has no column
+        probands, mothers, fathers = (columns[self.trios[:, i]] for i in range(3))
+        kept = probands >= 0
+        return probands[kept], mothers[kept], fathers[kept], self.source_codes[self.trios[kept, 0]]
+
+    def sample_numbers(self, source=None):
+        """
+        Count the samples and probands of the cohort or of one source.
+
+        Parameters:
+            source (str, optional): Source to count. Defaults to None (all the samples).
+
+        Returns:
+            dict: {'total': number of samples, 'probands': number of probands}.
+        """
+        if source is None:
+            positions = slice(None)
+        elif source in self.labels:
+            positions = self.source_positions[self.labels.index(source)]
+        else:
+            positions = []
+        return {'total': len(self.ids[positions]), 'probands': int(self.is_proband[positions].sum())}
+
+
+def get_cohort_index(cohort):
+    """
+    Get the CohortIndex of a cohort given as an index or as a pedigree dataframe.
+    """
+    return cohort if isinstance(cohort, CohortIndex) else CohortIndex.from_pedigree(cohort)
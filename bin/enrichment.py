@@ -0,0 +1,178 @@
+"""
+Proband enrichment statistics of the intervals.
+
+For every interval and group (all the samples, then every source) the carriers
+form a 2x2 table against the group sizes of the cohort (see
+`CohortIndex.sample_numbers`):
+
+                  carriers   non-carriers
+    probands         a         n_p - a
+    non-DSD          b         n_n - b
+
+with a and b the 'n probands' and 'n non-DSD' columns of the interval statistics.
+The odds ratio, the one-sided (proband enrichment) Fisher exact p-value and the
+Benjamini-Hochberg q-value over the intervals are computed for all the intervals
+of a group at once. `permutation_pvalues` gives an empirical p-value instead, from
+random relabelings of the probands of a group, also for all intervals at once.
+"""
+
+import numpy as np
+import pandas as pd
+
+from bin.carrier_matrix import CarrierMatrix
+from bin.cohort_index import get_cohort_index
+from bin.interval_stats import TOTAL_LABEL, get_group_masks, get_interval_codes
+
+ENRICHMENT_NAMES = ['odds ratio', 'p-value', 'q-value', 'permutation p-value']
+# permutations counted per sparse matrix product, bounding the memory to intervals x batch counts
+PERMUTATION_BATCH = 64
+
+
+def get_enrichment_columns(columns):
+    """
+    Get the enrichment columns ('<label> odds ratio', ...) of a result table.
+    """
+    return [col for col in columns if any(str(col).endswith(f' {name}') for name in ENRICHMENT_NAMES)]
+
+
+def odds_ratios(a, b, n_probands, n_others):
+    """
+    Sample odds ratios of the proband / non-DSD carrier tables.
+
+    Returns:
+        ndarray: a * (n_others - b) / ((n_probands - a) * b), inf when only the
+        denominator is 0, and NaN when both are or there are more carriers than samples.
+    """
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = a * (n_others - b) / ((n_probands - a) * b)
+    return np.where((a > n_probands) | (b > n_others), np.nan, ratios)
+
+
+def fisher_pvalues(a, b, n_probands, n_others):
+    """
+    One-sided Fisher exact p-values of more proband carriers than expected.
+
+    Given the a + b carriers of the group, the number of carriers among its n_probands
+    probands is hypergeometric, so P(X >= a) is the Fisher exact test with
+    alternative='greater' for all the tables at once.
+
+    Returns:
+        ndarray: The p-values, NaN where there are more carriers than samples in the group.
+    """
+    from scipy.stats import hypergeom
+
+    a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+    n_samples = n_probands + n_others
+    pvalues = hypergeom.sf(a - 1, n_samples, a + b, n_probands)
+    return np.where((a > n_probands) | (b > n_others), np.nan, np.clip(pvalues, 0, 1))
+
+
+def bh_qvalues(pvalues):
+    """
+    Benjamini-Hochberg FDR adjusted p-values (NaN p-values are left out and stay NaN).
+    """
+    pvalues = np.asarray(pvalues, dtype=np.float64)
+    qvalues = np.full(pvalues.shape, np.nan)
+    tested = np.flatnonzero(~np.isnan(pvalues))
+    order = tested[np.argsort(pvalues[tested], kind='stable')]
+    ranked = pvalues[order] * len(order) / np.arange(1, len(order) + 1)
+    qvalues[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1)
+    return qvalues
+
+
+def __group_sizes(cohort, label):
+    # (probands, non-DSD samples) of the cohort or of a source
+    numbers = cohort.sample_numbers(None if label == TOTAL_LABEL else label)
+    return numbers['probands'], numbers['total'] - numbers['probands']
+
+
+def interval_enrichment(stats, cohort):
+    """
+    Calculate the proband enrichment of every interval, overall and per source.
+
+    Parameters:
+        stats (DataFrame): Interval statistics with the '<label> n probands' and
+            '<label> n non-DSD' columns, indexed by INTERVAL_ID.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+
+    Returns:
+        DataFrame: The '<label> odds ratio', '<label> p-value' and '<label> q-value'
+        columns of every label, indexed like stats.
+    """
+    cohort = get_cohort_index(cohort)
+    columns = {}
+    for label in [TOTAL_LABEL] + list(cohort.labels):
+        if f'{label} n probands' not in stats:
+            continue
+        n_probands, n_others = __group_sizes(cohort, label)
+        a, b = stats[f'{label} n probands'].to_numpy(), stats[f'{label} n non-DSD'].to_numpy()
+        pvalues = fisher_pvalues(a, b, n_probands, n_others)
+        columns[f'{label} odds ratio'] = odds_ratios(a, b, n_probands, n_others)
+        columns[f'{label} p-value'] = pvalues
+        columns[f'{label} q-value'] = bh_qvalues(pvalues)
+    return pd.DataFrame(columns, index=stats.index)
+
+
+def add_interval_enrichment(result, cohort):
+    """
+    Add (or replace) the enrichment columns of a result table, after its statistics columns.
+    """
+    result = result.drop(columns=[col for col in get_enrichment_columns(result.columns)
+                                  if not col.endswith(' permutation p-value')])
+    return pd.concat([result, interval_enrichment(result, cohort)], axis=1)
+
+
+def permutation_pvalues(matrix, interval_ids, cohort, n_permutations, seed=0, batch=PERMUTATION_BATCH):
+    """
+    Empirical p-values of the proband carriers of every interval, overall and per source.
+
+    The probands of a group are relabeled at random among the group's samples
+    n_permutations times. The sample x interval carrier table is a sparse matrix, so
+    the proband carriers of every interval under a batch of permutations is a single
+    sparse x dense product. The p-value is (1 + permutations with at least the observed
+    proband carriers) / (1 + n_permutations).
+
+    Parameters:
+        matrix (PresenceMatrix or CarrierMatrix): Presence of every variant in every sample.
+        interval_ids (array-like): INTERVAL_ID of every variant row.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+        n_permutations (int): Number of permutations.
+        seed (int, optional): Random seed.
+        batch (int, optional): Permutations per matrix product.
+
+    Returns:
+        DataFrame: The '<label> permutation p-value' columns, indexed by sorted INTERVAL_ID.
+    """
+    from scipy import sparse
+
+    carriers = matrix if isinstance(matrix, CarrierMatrix) else CarrierMatrix.from_presence(matrix)
+    codes, index = get_interval_codes(interval_ids)
+    labels, masks = get_group_masks(carriers.samples, cohort)
+    n_samples = max(carriers.n_samples, 1)
+
+    # interval x sample "carries a variant of the interval"
+    rows, samples = carriers.to_coo()
+    carrier_codes = codes[rows].astype(np.int64)
+    pairs = np.unique(carrier_codes[carrier_codes >= 0] * n_samples + samples[carrier_codes >= 0])
+    exist = sparse.csr_matrix((np.ones(len(pairs), dtype=np.float32), np.divmod(pairs, n_samples)),
+                              shape=(len(index), carriers.n_samples))
+
+    rng = np.random.default_rng(seed)
+    groups = [(TOTAL_LABEL, np.ones(carriers.n_samples, dtype=bool), masks[:, 0])]
+    groups += [(label, masks[:, 1 + 2 * i], masks[:, 2 + 2 * i]) for i, label in enumerate(labels)]
+    columns = {}
+    for label, in_group, is_proband in groups:
+        members = np.flatnonzero(in_group)
+        n_probands = int(is_proband[members].sum())
+        observed = exist @ is_proband.astype(np.float32)
+        at_least = np.zeros(len(index), dtype=np.int64)
+        for start in range(0, n_permutations, batch):
+            n_batch = min(batch, n_permutations - start)
+            # a random n_probands members of every permutation are the probands
+            ranks = rng.random((n_batch, len(members))).argsort(axis=1).argsort(axis=1)
+            permuted = np.zeros((carriers.n_samples, n_batch), dtype=np.float32)
+            permuted[members] = (ranks < n_probands).T
+            at_least += (exist @ permuted >= observed[:, None]).sum(axis=1)
+        columns[f'{label} permutation p-value'] = (1 + at_least) / (1 + n_permutations)
+    return pd.DataFrame(columns, index=index)
@@ -0,0 +1,166 @@
+"""
+Sorted coordinate index of BED features.
+
+Keeps the features of every chromosome in sorted numpy arrays, so the nearest
+feature of (or the features overlapping) a whole table of peaks is found with
+one np.searchsorted pass per chromosome. The starts of every feature name are
+indexed the same way, for the distance of intervals to given (listed) features.
+Used for the DSD genes' TSS distance and reusable for any other BED annotation
+layer.
+"""
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+BED_COLUMNS = ['chr', 'start', 'end', 'name']
+
+
+class GenomicIndex:
+    """
+    Per-chromosome sorted arrays of BED feature coordinates.
+    """
+
+    def __init__(self, bed_df):
+        """
+        Parameters:
+            bed_df (DataFrame): Features with the columns 'chr', 'start', 'end' and 'name'.
+        """
+        self.features = bed_df[BED_COLUMNS].reset_index(drop=True)
+        self.chroms = {}
+        for chrom, features in bed_df.groupby('chr', sort=False):
+            starts = features['start'].to_numpy(dtype=np.int64)
+            ends = features['end'].to_numpy(dtype=np.int64)
+            order = np.argsort(starts, kind='stable')
+            self.chroms[str(chrom)] = {'start': starts[order],
+                                       'end': ends[order],
+                                       'name': features['name'].to_numpy(dtype=object)[order],
+                                       'sorted_end': np.sort(ends)}
+        # the sorted starts of every feature name (a gene may have a few locations)
+        self.names = {str(name): np.sort(features['start'].to_numpy(dtype=np.int64))
+                      for name, features in bed_df.groupby('name', sort=False)}
+
+    @classmethod
+    def from_bed(cls, path, header='infer'):
+        """
+        Build the index of a BED file whose first four columns are chr, start, end and name.
+
+        Parameters:
+            path (str): Path to the BED file.
+            header (int or None): Header row of the file, as in pd.read_table.
+
+        Returns:
+            GenomicIndex: The index of the file's features.
+        """
+        bed_df = pd.read_table(path, header=header).iloc[:, :len(BED_COLUMNS)]
+        bed_df.columns = BED_COLUMNS
+        return cls(bed_df)
+
+    def __query_chroms(self, chroms):
+        # positions of the queries of every indexed chromosome
+        chroms = pd.Series(np.asarray(chroms, dtype=str))
+        for chrom, rows in chroms.groupby(chroms, sort=False).indices.items():
+            if chrom in self.chroms:
+                yield self.chroms[chrom], rows
+
+    @staticmethod
+    def __nearest_starts(starts, froms, tos):
+        # distance and position of the start (in sorted starts) nearest to every interval
+        best_distance = np.full(len(froms), np.iinfo(np.int64).max)
+        best_feature = np.zeros(len(froms), dtype=np.int64)
+        for positions in (froms, tos):
+            right = np.searchsorted(starts, positions)
+            # the nearest start is either just left or just right of the position
+            for candidate in (np.clip(right - 1, 0, len(starts) - 1), np.clip(right, 0, len(starts) - 1)):
+                candidate_distance = np.abs(positions - starts[candidate])
+                closer = candidate_distance < best_distance
+                best_distance[closer] = candidate_distance[closer]
+                best_feature[closer] = candidate[closer]
+        return best_distance, best_feature
+
+    def nearest(self, chroms, froms, tos):
+        """
+        Find the feature start (TSS) nearest to every interval.
+
+        The distance of an interval to a start is the smaller of its distances from the
+        interval's two ends, as in the original TSS distance of the hot peaks table.
+
+        Parameters:
+            chroms (array-like): Chromosome of every interval.
+            froms (array-like): Start coordinate of every interval.
+            tos (array-like): End coordinate of every interval.
+
+        Returns:
+            tuple: (distance, name) arrays - the distance to the nearest feature start and
+            the feature's name, NaN / None for intervals on chromosomes without features.
+        """
+        froms = np.asarray(froms, dtype=np.int64)
+        tos = np.asarray(tos, dtype=np.int64)
+        distance = np.full(len(froms), np.nan)
+        name = np.full(len(froms), None, dtype=object)
+
+        for features, rows in self.__query_chroms(chroms):
+            distance[rows], best_feature = self.__nearest_starts(features['start'], froms[rows], tos[rows])
+            name[rows] = features['name'][best_feature]
+
+        return distance, name
+
+    def named_distance(self, names, froms, tos):
+        """
+        Find the distance of every interval to the nearest start of a given feature.
+
+        Parameters:
+            names (array-like): Feature name of every interval.
+            froms (array-like): Start coordinate of every interval.
+            tos (array-like): End coordinate of every interval.
+
+        Returns:
+            ndarray: The distance to the nearest start of the named feature (the smaller of its
+            distances from the interval's two ends), NaN for names that aren't in the index.
+        """
+        froms = np.asarray(froms, dtype=np.int64)
+        tos = np.asarray(tos, dtype=np.int64)
+        distance = np.full(len(froms), np.nan)
+
+        names = pd.Series(np.asarray(names, dtype=str))
+        for feature_name, rows in names.groupby(names, sort=False).indices.items():
+            if feature_name in self.names:
+                distance[rows], _ = self.__nearest_starts(self.names[feature_name], froms[rows], tos[rows])
+        return distance
+
+    def count_overlaps(self, chroms, froms, tos):
+        """
+        Count the features overlapping every interval.
+
+        Parameters:
+            chroms (array-like): Chromosome of every interval.
+            froms (array-like): Start coordinate of every interval.
+            tos (array-like): End coordinate of every interval.
+
+        Returns:
+            ndarray: Number of features with start <= to and end >= from.
+        """
+        froms = np.asarray(froms, dtype=np.int64)
+        tos = np.asarray(tos, dtype=np.int64)
+        counts = np.zeros(len(froms), dtype=np.int64)
+
+        for features, rows in self.__query_chroms(chroms):
+            # features that start before the interval's end, minus those that end before its start
+            counts[rows] = (np.searchsorted(features['start'], tos[rows], side='right')
+                            - np.searchsorted(features['sorted_end'], froms[rows], side='left'))
+        return counts
+
+
+@functools.lru_cache(maxsize=None)
+def load_bed_index(path):
+    """
+    Build (once per path) the index of a BED file with a header row.
+
+    Parameters:
+        path (str): Path to the BED file.
+
+    Returns:
+        GenomicIndex: The index of the file's features.
+    """
+    return GenomicIndex.from_bed(path)
@@ -0,0 +1,13 @@
+"""
+Genotype codes of the cleaned ':GT' columns.
+
+clean_tsv.py stores every call as an int8 code: the call type, plus GT_PHASED for
+phased calls. Kept apart from the script so the presence matrix library can test
+the codes without importing it.
+"""
+
+GT_MISSING = 0
+GT_REF = 1
+GT_HET = 2
+GT_HOM_ALT = 3
+GT_PHASED = 4
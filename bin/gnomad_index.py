@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+Indexed gnomAD annotation lookup.
+
+`build_index` converts a gnomAD extract (the tab separated, gzipped output of
+getGnomAD.sh: CHROM, POS, REF, ALT, FILTER, AF, AF_popmax without a header) to
+one Parquet file per chromosome, sorted by POS and split into small row groups.
+`lookup` then reads only the row groups whose POS statistics overlap the
+positions of the variants, instead of decompressing the whole extract.
+
+Usage: python gnomad_index.py gnomAD_file.tsv.gz index_dir
+"""
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+INDEX_COLS = ['CHROM', 'POS', 'REF', 'ALT']
+GNOMAD_COLS = INDEX_COLS + ['FILTER', 'AF', 'AF_popmax']
+FLOAT_COLS = ['AF', 'AF_popmax']
+# small row groups, so a lookup skips most of a chromosome by the POS statistics
+INDEX_ROW_GROUP_SIZE = 16 * 1024
+CHUNKSIZE = 1000000
+INDEX_SUFFIX = '.parquet'
+
+
+def get_index_path(index_dir, chrom):
+    return os.path.join(index_dir, f'{chrom}{INDEX_SUFFIX}')
+
+
+def __read_extract(gnomAD_path, chunksize):
+    # the extract in chunks, AF / AF_popmax as floats ('.' is NaN)
+    for chunk in pd.read_csv(gnomAD_path, sep='\t', header=None, names=GNOMAD_COLS,
+                             dtype={'CHROM': str, 'REF': str, 'ALT': str, 'FILTER': str},
+                             chunksize=chunksize):
+        chunk[FLOAT_COLS] = chunk[FLOAT_COLS].apply(pd.to_numeric, errors='coerce')
+        yield chunk
+
+
+def build_index(gnomAD_path, index_dir, chunksize=CHUNKSIZE, row_group_size=INDEX_ROW_GROUP_SIZE):
+    """
+    Build the per-chromosome Parquet index of a gnomAD extract.
+
+    The extract is read in chunks and every chromosome's rows are appended to its
+    own file, so the memory used is about one chunk. The rows of every chromosome
+    must be sorted by POS, as in the bcftools output.
+
+    Parameters:
+        gnomAD_path (str): Path to the gzipped gnomAD extract.
+        index_dir (str): Output directory, one '<chrom>.parquet' file per chromosome.
+        chunksize (int): Number of rows read at a time.
+        row_group_size (int): Rows per row group.
+
+    Returns:
+        list: The indexed chromosomes.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([('CHROM', pa.string()), ('POS', pa.int64()), ('REF', pa.string()), ('ALT', pa.string()),
+                        ('FILTER', pa.string()), ('AF', pa.float64()), ('AF_popmax', pa.float64())])
+    os.makedirs(index_dir, exist_ok=True)
+    writers, last_pos = {}, {}
+    try:
+        for chunk in __read_extract(gnomAD_path, chunksize):
+            for chrom, rows in chunk.groupby('CHROM', sort=False):
+                pos = rows.POS.to_numpy()
+                if np.any(np.diff(pos) < 0) or pos[0] < last_pos.get(chrom, pos[0]):
+                    raise ValueError(f"{gnomAD_path} is not sorted by POS on {chrom}")
+                last_pos[chrom] = pos[-1]
+
+                if chrom not in writers:
+                    writers[chrom] = pq.ParquetWriter(get_index_path(index_dir, chrom), schema)
+                writers[chrom].write_table(pa.Table.from_pandas(rows, schema=schema, preserve_index=False),
+                                           row_group_size=row_group_size)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return list(writers)
+
+
+def __overlapping_row_groups(parquet_file, positions):
+    # row groups whose POS range contains one of the sorted positions
+    pos_col = parquet_file.schema_arrow.get_field_index('POS')
+    groups = []
+    for i in range(parquet_file.metadata.num_row_groups):
+        stats = parquet_file.metadata.row_group(i).column(pos_col).statistics
+        if stats is None or not stats.has_min_max:
+            groups.append(i)
+        elif np.searchsorted(positions, stats.min, 'left') < np.searchsorted(positions, stats.max, 'right'):
+            groups.append(i)
+    return groups
+
+
+def __cache_path(cache_dir, index_path, chrom, keys):
+    # the cached subset is named by the index file version and the looked-up variants
+    stat = os.stat(index_path)
+    digest = hashlib.sha1(f'{os.path.abspath(index_path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    digest.update(pd.util.hash_pandas_object(keys, index=False).to_numpy().tobytes())
+    return os.path.join(cache_dir, f'{chrom}.{digest.hexdigest()[:16]}{INDEX_SUFFIX}')
+
+
+def lookup_chrom(index_dir, chrom, keys, cache_dir=None):
+    """
+    Get the gnomAD rows of the variants of one chromosome.
+
+    Parameters:
+        index_dir (str): Directory built by `build_index`.
+        chrom (str): Chromosome of the variants.
+        keys (DataFrame): INDEX_COLS of the variants.
+        cache_dir (str, optional): Directory of cached lookups. A lookup of the same
+            variants in the same index is read from there.
+
+    Returns:
+        pd.DataFrame: The matching gnomAD rows in index order, indexed by INDEX_COLS.
+    """
+    import pyarrow.parquet as pq
+
+    index_path = get_index_path(index_dir, chrom)
+    if not os.path.exists(index_path):
+        return pd.DataFrame(columns=GNOMAD_COLS).set_index(INDEX_COLS)
+
+    if cache_dir is not None:
+        cache_path = __cache_path(cache_dir, index_path, chrom, keys)
+        if os.path.exists(cache_path):
+            return pd.read_parquet(cache_path).set_index(INDEX_COLS)
+
+    parquet_file = pq.ParquetFile(index_path)
+    positions = np.unique(keys.POS.to_numpy(dtype=np.int64))
+    gnomad = parquet_file.read_row_groups(__overlapping_row_groups(parquet_file, positions)).to_pandas()
+    gnomad = gnomad.set_index(INDEX_COLS)
+    gnomad = gnomad[gnomad.index.isin(pd.MultiIndex.from_frame(keys[INDEX_COLS]))]
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        gnomad.reset_index().to_parquet(cache_path, index=False)
+    return gnomad
+
+
+def lookup(index_dir, keys, cache_dir=None):
+    """
+    Get the gnomAD rows of a set of variants from the index.
+
+    Parameters:
+        index_dir (str): Directory built by `build_index`.
+        keys (DataFrame): INDEX_COLS of the variants.
+        cache_dir (str, optional): Directory of cached lookups.
+
+    Returns:
+        pd.DataFrame: The matching gnomAD rows, indexed by INDEX_COLS.
+    """
+    keys = keys[INDEX_COLS].drop_duplicates().reset_index(drop=True)
+    parts = [lookup_chrom(index_dir, chrom, chrom_keys.reset_index(drop=True), cache_dir)
+             for chrom, chrom_keys in keys.groupby('CHROM', sort=False)]
+    if not parts:
+        return pd.DataFrame(columns=GNOMAD_COLS).set_index(INDEX_COLS)
+    return pd.concat(parts)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python gnomad_index.py gnomAD_file.tsv.gz index_dir")
+        sys.exit(1)
+    chroms = build_index(sys.argv[1], sys.argv[2])
+    print(f"Indexed {len(chroms)} chromosomes in {sys.argv[2]}")
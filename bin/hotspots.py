@@ -0,0 +1,143 @@
+"""
+Sliding-window hotspot discovery.
+
+Finds clusters of variants carried by probands anywhere along the genome, not
+only in the predefined INTERVAL_IDs. The carriers of every variant are counted
+once per sample group (the proband / source masks of `interval_stats.get_group_masks`),
+and the carrier counts of every window of `window` bases (starting every `step`
+bases) are differences of their cumulative sums over the POS-sorted variants of a
+chromosome. Only windows holding variants are generated, so the time is linear in
+the number of variants (times window / step).
+
+A window is a hotspot when its proband carriers are over-represented against the
+proband fraction of the group's samples: one-sided binomial p-value of the proband
+carriers among all the carriers of the window, and BH q-values over the windows.
+Variants of a sample in the same window aren't independent, so the p-values rank
+the windows rather than being exact.
+"""
+
+import numpy as np
+import pandas as pd
+
+from bin.enrichment import bh_qvalues
+from bin.interval_stats import TOTAL_LABEL, get_group_masks
+
+DEFAULT_WINDOW = 10000
+DEFAULT_STEP = 2000
+MIN_VARIANTS = 3
+MAX_Q = 0.05
+
+
+def get_window_starts(positions, window, step):
+    """
+    The window starts (multiples of step) of the windows holding at least one variant.
+
+    Parameters:
+        positions (ndarray): Sorted variant positions of a chromosome.
+        window (int): Window length.
+        step (int): Distance between window starts.
+
+    Returns:
+        ndarray: Sorted, distinct window starts.
+    """
+    if not len(positions):
+        return np.zeros(0, dtype=np.int64)
+    positions = np.asarray(positions, dtype=np.int64)
+    # the windows [k * step, k * step + window) holding a variant at p have k_first <= k <= k_last
+    k_first = np.maximum((positions - window) // step + 1, 0)
+    k_last = positions // step
+    # the ranges are sorted, so skipping the windows of the previous variants removes the repeats
+    k_first = np.maximum(k_first, np.concatenate([[0], np.maximum.accumulate(k_last)[:-1] + 1]))
+    lengths = np.maximum(k_last - k_first + 1, 0)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return (np.repeat(k_first, lengths) + offsets) * step
+
+
+def window_sums(positions, counts, window, step):
+    """
+    Sum per-variant counts over the sliding windows of one chromosome.
+
+    Parameters:
+        positions (ndarray): Sorted variant positions.
+        counts (ndarray): (n_variants, n_counts) counts of every variant.
+        window (int): Window length.
+        step (int): Distance between window starts.
+
+    Returns:
+        tuple: (starts, n_variants, sums) of every window holding variants.
+    """
+    starts = get_window_starts(positions, window, step)
+    cumulative = np.zeros((len(positions) + 1, counts.shape[1]), dtype=np.int64)
+    np.cumsum(counts, axis=0, out=cumulative[1:])
+    first = np.searchsorted(positions, starts, side='left')
+    last = np.searchsorted(positions, starts + window, side='left')
+    return starts, last - first, cumulative[last] - cumulative[first]
+
+
+def __binomial_pvalues(k, n, p):
+    from scipy.stats import binom
+
+    return np.where(n > 0, binom.sf(k - 1, n, p), np.nan)
+
+
+def find_hotspots(matrix, chroms, positions, cohort, window=DEFAULT_WINDOW, step=DEFAULT_STEP,
+                  min_variants=MIN_VARIANTS, max_q=MAX_Q):
+    """
+    Find the windows where proband carriers are over-represented.
+
+    Parameters:
+        matrix (PresenceMatrix or CarrierMatrix): Presence of every variant in every sample.
+        chroms (array-like): CHROM of every variant row.
+        positions (array-like): POS of every variant row.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+        window (int): Window length in bases.
+        step (int): Distance between window starts.
+        min_variants (int): Least variants of a tested window.
+        max_q (float, optional): Report the windows with a total q-value up to this. None for all
+            the tested windows.
+
+    Returns:
+        DataFrame: CHROM, from, to, n variants and, for total and every source, the
+        'n proband carriers', 'n non-DSD carriers', 'fold enrichment', 'p-value' and
+        'q-value' of every reported window, in genomic order, indexed by WINDOW_ID
+        ('<chrom>:<from>-<to>').
+    """
+    labels, masks = get_group_masks(matrix.samples, cohort)
+    # per group: (all the group's samples, its probands)
+    groups = [(np.ones(len(masks), dtype=bool), masks[:, 0])]
+    groups += [(masks[:, 1 + 2 * i], masks[:, 2 + 2 * i]) for i in range(len(labels))]
+    counts = np.column_stack([matrix.variant_counts(mask) for group in groups for mask in group])
+
+    chrom_codes, chrom_names = pd.factorize(pd.Series(chroms))
+    positions = np.asarray(positions, dtype=np.int64)
+    order = np.lexsort((positions, chrom_codes))
+    bounds = np.searchsorted(chrom_codes[order], np.arange(len(chrom_names) + 1))
+
+    parts = []
+    for code, chrom in enumerate(chrom_names):
+        rows = order[bounds[code]:bounds[code + 1]]
+        starts, n_variants, sums = window_sums(positions[rows], counts[rows], window, step)
+        tested = n_variants >= min_variants
+        parts.append((np.full(tested.sum(), chrom, dtype=object), starts[tested], n_variants[tested], sums[tested]))
+
+    chrom_column, starts, n_variants, sums = (np.concatenate(i) for i in zip(*parts)) if parts else \
+        (np.zeros(0, dtype=object), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+         np.zeros((0, counts.shape[1]), dtype=np.int64))
+    columns = {'CHROM': chrom_column, 'from': starts, 'to': starts + window, 'n variants': n_variants}
+    for i, (label, (in_group, is_proband)) in enumerate(zip([TOTAL_LABEL] + labels, groups)):
+        carriers, proband_carriers = sums[:, 2 * i], sums[:, 2 * i + 1]
+        expected = is_proband.sum() / max(in_group.sum(), 1)
+        pvalues = __binomial_pvalues(proband_carriers, carriers, expected)
+        columns[f'{label} n proband carriers'] = proband_carriers
+        columns[f'{label} n non-DSD carriers'] = carriers - proband_carriers
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns[f'{label} fold enrichment'] = proband_carriers / carriers / expected
+        columns[f'{label} p-value'] = pvalues
+        columns[f'{label} q-value'] = bh_qvalues(pvalues)
+
+    index = pd.Index([f'{chrom}:{start}-{start + window}' for chrom, start in zip(chrom_column, starts)],
+                     name='WINDOW_ID')
+    hotspots = pd.DataFrame(columns, index=index)
+    if max_q is not None:
+        hotspots = hotspots[hotspots[f'{TOTAL_LABEL} q-value'] <= max_q]
+    return hotspots
@@ -0,0 +1,266 @@
+"""
+Vectorized interval statistics.
+
+Computes the same per-interval "n probands / n non-DSD / n variants" columns as
+`hot_peaks_table.get_interval_stats`, but for all intervals at once: the sample
+to source/proband masks come from the cohort index (see bin/cohort_index.py),
+and every group count is either a popcount of the packed presence matrix (see
+bin/presence_matrix.py), a segment sum over the sparse carriers (see
+bin/carrier_matrix.py) or a matrix product of the per-interval sample counts
+with the group masks.
+"""
+
+import numpy as np
+import pandas as pd
+
+import bin.workers as workers_pool
+from bin.carrier_matrix import CarrierMatrix
+from bin.cohort_index import get_cohort_index
+from bin.presence_matrix import popcount
+
+TOTAL_LABEL = 'total'
+STAT_NAMES = ['n probands', 'n non-DSD', 'n proband variants', 'n non-DSD variants']
+
+
+def get_group_masks(samples, cohort):
+    """
+    Build the sample membership masks of the proband and source groups.
+
+    Parameters:
+        samples (Index): Sample names, in the column order of the variant table.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe to build them from.
+
+    Returns:
+        tuple: (labels, masks) where labels are the pedigree sources in order of
+        appearance and masks is a (n_samples, 1 + 2 * n_labels) boolean matrix whose
+        columns are [probands, label_1, label_1 probands, label_2, ...].
+    """
+    return get_cohort_index(cohort).group_masks(samples)
+
+
+def get_interval_codes(interval_ids):
+    """
+    Number the intervals of the variants in sorted INTERVAL_ID order.
+
+    Parameters:
+        interval_ids (array-like): INTERVAL_ID of every variant.
+
+    Returns:
+        tuple: (codes, index) - the interval code of every variant (-1 when it has
+        no interval) and the sorted INTERVAL_ID index of the codes.
+    """
+    codes, uniques = pd.factorize(pd.Series(interval_ids), sort=True)
+    return codes, pd.Index(uniques, name='INTERVAL_ID')
+
+
+def __assemble_stats(index, labels, exist_groups, variant_groups, n_exist, n_variants):
+    stats = {
+        f'{TOTAL_LABEL} n probands': exist_groups[:, 0],
+        f'{TOTAL_LABEL} n non-DSD': n_exist - exist_groups[:, 0],
+        f'{TOTAL_LABEL} n proband variants': variant_groups[:, 0],
+        f'{TOTAL_LABEL} n non-DSD variants': n_variants - variant_groups[:, 0],
+    }
+    for i, label in enumerate(labels):
+        in_label, label_probands = 1 + 2 * i, 2 + 2 * i
+        stats[f'{label} n probands'] = exist_groups[:, label_probands]
+        stats[f'{label} n non-DSD'] = exist_groups[:, in_label] - exist_groups[:, label_probands]
+        stats[f'{label} n proband variants'] = variant_groups[:, label_probands]
+        # Matches get_interval_stats, which subtracts from the variants of all samples
+        stats[f'{label} n non-DSD variants'] = n_variants - variant_groups[:, label_probands]
+
+    return pd.DataFrame(stats, index=index).round().astype(np.int64)
+
+
+def get_stat_columns(columns):
+    """
+    Get the interval statistics columns ('<label> n probands', ...) of a result table.
+    """
+    return [col for col in columns if any(str(col).endswith(f' {name}') for name in STAT_NAMES)]
+
+
+def __group_counts(stats, labels):
+    # the __assemble_stats inputs of a statistics table, zero for the labels it doesn't have
+    def column(name):
+        return stats[name].to_numpy(dtype=np.int64) if name in stats else np.zeros(stats.shape[0], dtype=np.int64)
+
+    n_exist = column(f'{TOTAL_LABEL} n probands') + column(f'{TOTAL_LABEL} n non-DSD')
+    n_variants = column(f'{TOTAL_LABEL} n proband variants') + column(f'{TOTAL_LABEL} n non-DSD variants')
+    exist_groups, variant_groups = [column(f'{TOTAL_LABEL} n probands')], [column(f'{TOTAL_LABEL} n proband variants')]
+    for label in labels:
+        label_probands = column(f'{label} n probands')
+        exist_groups += [label_probands + column(f'{label} n non-DSD'), label_probands]
+        # the variants of all the label's samples are not part of the statistics
+        variant_groups += [np.zeros(stats.shape[0], dtype=np.int64), column(f'{label} n proband variants')]
+    return np.column_stack(exist_groups), np.column_stack(variant_groups), n_exist, n_variants
+
+
+def add_interval_stats(stats_a, stats_b, labels):
+    """
+    Combine the interval statistics of two disjoint sets of samples.
+
+    Every statistic is a count over the samples, so the statistics of the union are
+    the sums of the group counts of both sets (a label or an interval missing from a
+    table counts as zero).
+
+    Parameters:
+        stats_a (DataFrame): Statistics of the first samples, indexed by INTERVAL_ID.
+        stats_b (DataFrame): Statistics of the other samples, indexed by INTERVAL_ID.
+        labels (list): The pedigree sources of the combined table, in column order.
+
+    Returns:
+        DataFrame: One row per interval of either table with the columns of `get_interval_stats`.
+    """
+    index = stats_a.index.union(stats_b.index)
+    counts_a = __group_counts(stats_a.reindex(index, fill_value=0), labels)
+    counts_b = __group_counts(stats_b.reindex(index, fill_value=0), labels)
+    return __assemble_stats(index, labels, *(a + b for a, b in zip(counts_a, counts_b)))
+
+
+def interval_stats_from_sums(sums, cohort):
+    """
+    Calculate the interval statistics from the per-interval sample counts.
+
+    Parameters:
+        sums (DataFrame): Interval x sample variant counts, indexed by INTERVAL_ID.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+
+    Returns:
+        DataFrame: One row per interval with the columns of `get_interval_stats`.
+    """
+    labels, masks = get_group_masks(sums.columns, cohort)
+    masks = masks.astype(np.float64)
+    counts = sums.to_numpy(dtype=np.float64)
+    exist = (counts > 0).astype(np.float64)
+
+    # Float matrix products go through BLAS; the counts stay exact integers
+    return __assemble_stats(sums.index, labels, exist @ masks, counts @ masks,
+                            exist.sum(axis=1), counts.sum(axis=1))
+
+
+def __interval_blocks(matrix, codes, n_blocks):
+    # (packed rows, interval codes from 0) blocks of whole intervals: contiguous row ranges of the rows sorted by interval
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    sorted_codes = codes[order]
+    if not len(order):
+        return []
+    starts = np.flatnonzero(np.diff(sorted_codes, prepend=-1))
+    # a table already sorted by INTERVAL_ID is sliced in place, otherwise the rows are sorted once
+    if order[-1] - order[0] + 1 == len(order) and np.all(np.diff(order) == 1):
+        packed = matrix.packed[order[0]:order[-1] + 1]
+    else:
+        packed = matrix.packed[order]
+
+    targets = np.arange(1, n_blocks) * len(order) // n_blocks
+    cuts = np.unique(np.r_[0, starts[np.minimum(np.searchsorted(starts, targets), len(starts) - 1)], len(order)])
+    return [(packed[a:b], sorted_codes[a:b] - sorted_codes[a]) for a, b in zip(cuts[:-1], cuts[1:]) if b > a]
+
+
+def __block_group_counts(block, packed_masks):
+    """
+    Count the group carriers of a block of whole intervals.
+
+    Returns:
+        tuple: (exist_groups, variant_groups, n_exist, n_variants) of the block's intervals.
+    """
+    packed, codes = block
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    # every interval of the block OR-ed to "has any variant in the interval" bits
+    presence = np.bitwise_or.reduceat(packed, starts, axis=0)
+
+    exist_groups = np.column_stack([popcount(presence & mask) for mask in packed_masks])
+    variant_groups = np.column_stack([np.add.reduceat(popcount(packed & mask), starts) for mask in packed_masks])
+    return exist_groups, variant_groups, popcount(presence), np.add.reduceat(popcount(packed), starts)
+
+
+def interval_stats_from_presence(matrix, interval_ids, cohort, workers=None, backend='serial'):
+    """
+    Calculate the interval statistics directly on a packed presence matrix.
+
+    The carriers of a group are counted with popcounts of the packed rows against
+    the packed group mask: per interval (rows OR-ed together) for the sample
+    counts, and per variant then summed by interval for the variant counts.
+    The intervals are split into blocks processed by `workers` workers; the packed
+    group masks are sent to each worker once.
+
+    Parameters:
+        matrix (PresenceMatrix): Presence of every variant in every sample.
+        interval_ids (array-like): INTERVAL_ID of every variant row.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+        workers (int, optional): Number of workers. Defaults to the available CPUs.
+        backend (str, optional): 'process', 'thread' or 'serial'. Defaults to 'serial'.
+
+    Returns:
+        DataFrame: One row per interval with the columns of `get_interval_stats`.
+    """
+    codes, index = get_interval_codes(interval_ids)
+    labels, masks = get_group_masks(matrix.samples, cohort)
+    packed_masks = [matrix.sample_mask(mask) for mask in masks.T]
+
+    n_blocks = workers_pool.get_n_blocks(workers or workers_pool.get_default_workers(), backend)
+    blocks = __interval_blocks(matrix, codes, n_blocks)
+    results = workers_pool.map_blocks(__block_group_counts, blocks, {'packed_masks': packed_masks},
+                                      backend=backend, workers=workers)
+
+    if not results:
+        results = [(np.zeros((0, masks.shape[1])), np.zeros((0, masks.shape[1])), np.zeros(0), np.zeros(0))]
+    exist_groups, variant_groups, n_exist, n_variants = (np.concatenate(i) for i in zip(*results))
+    return __assemble_stats(index, labels, exist_groups, variant_groups, n_exist, n_variants)
+
+
+def interval_stats_from_carriers(carriers, interval_ids, cohort):
+    """
+    Calculate the interval statistics from a sparse carrier matrix.
+
+    Every count is a segment sum (np.bincount by interval code) over the carriers:
+    of all the carriers for the variant counts, and of the distinct (interval, sample)
+    carrier pairs for the sample counts. Time and memory scale with the number of
+    carriers, not variants x samples.
+
+    Parameters:
+        carriers (CarrierMatrix): Carriers of every variant.
+        interval_ids (array-like): INTERVAL_ID of every variant row.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+
+    Returns:
+        DataFrame: One row per interval with the columns of `get_interval_stats`.
+    """
+    codes, index = get_interval_codes(interval_ids)
+    labels, masks = get_group_masks(carriers.samples, cohort)
+    n_intervals, n_samples = len(index), max(carriers.n_samples, 1)
+
+    rows, samples = carriers.to_coo()
+    carrier_codes = codes[rows]
+    in_interval = carrier_codes >= 0
+    carrier_codes, samples = carrier_codes[in_interval].astype(np.int64), samples[in_interval]
+
+    # a sample exists in an interval once, however many of its variants it carries
+    pair_codes, pair_samples = np.divmod(np.unique(carrier_codes * n_samples + samples), n_samples)
+
+    exist_groups = np.column_stack([np.bincount(pair_codes[mask[pair_samples]], minlength=n_intervals)
+                                    for mask in masks.T])
+    variant_groups = np.column_stack([np.bincount(carrier_codes[mask[samples]], minlength=n_intervals)
+                                      for mask in masks.T])
+    return __assemble_stats(index, labels, exist_groups, variant_groups,
+                            np.bincount(pair_codes, minlength=n_intervals),
+                            np.bincount(carrier_codes, minlength=n_intervals))
+
+
+def get_all_interval_stats(matrix, interval_ids, cohort, workers=None, backend='serial'):
+    """
+    Calculate the statistics of every interval in a few vectorized passes.
+
+    Parameters:
+        matrix (PresenceMatrix or CarrierMatrix): Presence of every variant in every sample,
+            packed or as sparse carrier lists.
+        interval_ids (array-like): INTERVAL_ID of every variant row.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+        workers (int, optional): Number of workers. Defaults to the available CPUs.
+        backend (str, optional): 'process', 'thread' or 'serial'. Defaults to 'serial'.
+
+    Returns:
+        DataFrame: One row per interval with the columns of `get_interval_stats`.
+    """
+    if isinstance(matrix, CarrierMatrix):
+        return interval_stats_from_carriers(matrix, interval_ids, cohort)
+    return interval_stats_from_presence(matrix, interval_ids, cohort, workers, backend)
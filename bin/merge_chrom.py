@@ -1,7 +1,11 @@
 #!/usr/bin/env python
+import os
 import sys
+import numpy as np
 import pandas as pd
 
+import gnomad_index
+
 # Define constant column names for the DataFrame
 INDEX_COLS = ['CHROM', 'POS', 'REF', 'ALT']
 GNOMAD_COLS = INDEX_COLS + ['FILTER', 'AF', 'AF_popmax']
@@ -11,44 +15,157 @@ GNOMAD_PATH_IDX = 2
 OUTPUT_NAME_IDX = 3
 INPUT_FILES_IDX = 4
 
-def add_gnomAD(df, gnomAD_path):
+# chrom argument of the single-pass mode, which merges every chromosome in one read of the inputs
+ALL_CHROMS = 'all'
+# chromosomes of the single-pass mode, in the (VCF) order of the input files
+CHROMOSOMES = [f'chr{i}' for i in range(1, 23)] + ['chrX', 'chrY', 'chrM']
+CHUNKSIZE = 100000
+# directory of cached gnomAD index lookups, used when this environment variable is set
+GNOMAD_CACHE_ENV = 'GNOMAD_CACHE_DIR'
+
+def add_gnomAD(df, gnomAD_path, cache_dir=None):
     """
     Add gnomAD data to the given DataFrame based on the common INDEX_COLS.
+
+    gnomAD_path is either the gzipped gnomAD extract, which is read in full, or an
+    index directory built by gnomad_index.py, of which only the row groups around
+    the variants' positions are read.
     
     Args:
         df (pd.DataFrame): The input DataFrame.
-        gnomAD_path (str): Path to the gnomAD data file.
+        gnomAD_path (str): Path to the gnomAD data file or index directory.
+        cache_dir (str, optional): Directory caching the index lookups.
         
     Returns:
         pd.DataFrame: The DataFrame with added gnomAD data.
     """
-    gnomad = pd.read_csv(gnomAD_path, compression='gzip', sep='\t', header=None)
-    gnomad.columns = GNOMAD_COLS
-
-    gnomad = gnomad.set_index(INDEX_COLS)
     df = df.reset_index().set_index(INDEX_COLS)
-    gnomad = gnomad[gnomad.index.isin(df.index)]
+    if os.path.isdir(gnomAD_path):
+        gnomad = gnomad_index.lookup(gnomAD_path, df.index.to_frame(index=False), cache_dir)
+    else:
+        gnomad = pd.read_csv(gnomAD_path, compression='gzip', sep='\t', header=None)
+        gnomad.columns = GNOMAD_COLS
+
+        gnomad = gnomad.set_index(INDEX_COLS)
+        gnomad = gnomad[gnomad.index.isin(df.index)]
     df = pd.concat([gnomad, df], axis=1)
     return df
 
-def main(csv_files, chrom):
+def read_chrom_chunks(file, chroms, chunksize=CHUNKSIZE):
+    """
+    Read a CSV file in chunks, keeping only the rows of the given chromosomes.
+
+    The rows of other chromosomes are dropped chunk by chunk, so the whole file is
+    never held in memory.
+
+    Args:
+        file (str): Input CSV file.
+        chroms (list): Chromosomes to keep.
+        chunksize (int): Number of rows read at a time.
+
+    Yields:
+        pd.DataFrame: The kept rows of every chunk, with the '[n]' column prefixes removed.
+    """
+    for df in pd.read_csv(file, sep='\t', chunksize=chunksize):
+        df.columns = [col.split(']')[1] for col in df.columns]
+        yield df[df.CHROM.isin(chroms)]
+
+def __join_samples(dfs):
+    # outer join of the sample columns of every file on the non-sample columns
+    dfs = [df.set_index([col for col in df.columns if ':' not in col]) for df in dfs]
+    return pd.concat(dfs, axis=1).sort_index()
+
+def __sort_keys(df, chroms):
+    # (chromosome rank, POS) of every row, as one int64 key
+    ranks = pd.Index(chroms).get_indexer(df.CHROM)
+    return ranks.astype(np.int64) << 32 | df.POS.to_numpy(dtype=np.int64)
+
+def merge_all_chroms(csv_files, chroms=CHROMOSOMES, chunksize=CHUNKSIZE):
+    """
+    Join the sample columns of multiple CSV files for every chromosome in one read of each file.
+
+    A streaming sorted merge: the files are read chunk by chunk, and the rows of every
+    (CHROM, POS) that all the files have passed are joined (as in `main`) and collected
+    under their chromosome. Every input must be sorted by chromosome, in the order of
+    chroms, and by POS.
+
+    Args:
+        csv_files (list): List of input CSV files.
+        chroms (list): Chromosomes to merge, in the order of the files. Other chromosomes are skipped.
+        chunksize (int): Number of rows read from a file at a time.
+
+    Yields:
+        tuple: (chrom, df) for every merged chromosome in order, df as returned by `main`.
+    """
+    readers = [read_chrom_chunks(file, chroms, chunksize) for file in csv_files]
+    buffers = [pd.read_csv(file, sep='\t', nrows=0).rename(columns=lambda col: col.split(']')[1])
+               for file in csv_files]
+    last_keys = [-1] * len(readers)
+    done = [False] * len(readers)
+    pending = {}
+
+    def extend_buffer(i):
+        # read chunks of file i until its buffer holds more than one key (or the file ends)
+        while not done[i]:
+            keys = __sort_keys(buffers[i], chroms)
+            if len(keys) and keys[0] != keys[-1]:
+                return
+            chunk = next(readers[i], None)
+            if chunk is None:
+                done[i] = True
+                return
+            chunk_keys = __sort_keys(chunk, chroms)
+            if len(chunk_keys):
+                if np.any(np.diff(chunk_keys) < 0) or chunk_keys[0] < last_keys[i]:
+                    raise ValueError(f"{csv_files[i]} is not sorted by chromosome and POS")
+                last_keys[i] = chunk_keys[-1]
+            # the header-only starting buffer has no dtypes to keep
+            buffers[i] = pd.concat([buffers[i], chunk], ignore_index=True) if buffers[i].shape[0] else chunk
+
+    for i in range(len(readers)):
+        extend_buffer(i)
+
+    while True:
+        active = [i for i in range(len(readers)) if not done[i]]
+        # no unread row of an active file comes before the last key of its buffer
+        bound = min((__sort_keys(buffers[i], chroms)[-1] for i in active), default=np.iinfo(np.int64).max)
+
+        ready = []
+        for i, buffer in enumerate(buffers):
+            is_ready = __sort_keys(buffer, chroms) < bound
+            ready.append(buffer[is_ready])
+            buffers[i] = buffer[~is_ready]
+        joined = __join_samples(ready)
+        for chrom, df in joined.groupby(level='CHROM', sort=False):
+            pending.setdefault(chrom, []).append(df)
+
+        # chromosomes before the bound are complete
+        bound_rank = bound >> 32
+        for rank, chrom in enumerate(chroms):
+            if chrom in pending and (rank < bound_rank or not active):
+                yield chrom, pd.concat(pending.pop(chrom))
+        if not active:
+            return
+        for i in active:
+            extend_buffer(i)
+
+def main(csv_files, chrom, chunksize=CHUNKSIZE):
     """
     Concatenate data from multiple CSV files based on the given chromosome.
     
     Args:
         csv_files (list): List of input CSV files.
         chrom (str): Chromosome to filter data on.
+        chunksize (int): Number of rows read from a file at a time.
         
     Returns:
         pd.DataFrame: Concatenated DataFrame with filtered data.
     """
     dfs = []  # List to store individual DataFrames from each CSV file
 
-    # Read and append each CSV file to the list
+    # Read and append the chromosome's rows of each CSV file to the list
     for file in csv_files:
-        df = pd.read_csv(file, sep='\t')
-        df.columns = [col.split(']')[1] for col in df.columns]
-        df = df[df.CHROM == chrom]
+        df = pd.concat(read_chrom_chunks(file, [chrom], chunksize))
         df = df.set_index([col for col in df.columns if ':' not in col])
         dfs.append(df)
 
@@ -60,14 +177,25 @@ if __name__ == '__main__':
     if len(sys.argv) < 3:
         print("Error: Insufficient command line arguments.")
         print("Usage: python script_name.py chrom gnomAD_file.csv output_name input_file1.tsv input_file2.tsv ...")
+        print(f"With chrom '{ALL_CHROMS}' every chromosome is merged in one pass and written to "
+              "output_name_<chrom>.tsv; a '{chrom}' in the gnomAD path is replaced by the chromosome.")
+        print("The gnomAD path may be an index directory built by gnomad_index.py; set "
+              f"{GNOMAD_CACHE_ENV} to cache its lookups.")
         sys.exit(1)
     
     chrom = sys.argv[1]
     gnomAD_path = sys.argv[GNOMAD_PATH_IDX]
     output_name = sys.argv[OUTPUT_NAME_IDX]
     input_files = sys.argv[INPUT_FILES_IDX:]
+    cache_dir = os.environ.get(GNOMAD_CACHE_ENV)
     
-    df = main(input_files, chrom)
-    df = add_gnomAD(df, gnomAD_path)
-    df.to_csv(f"{output_name}.tsv", sep='\t')
+    if chrom == ALL_CHROMS:
+        for chrom, df in merge_all_chroms(input_files):
+            df = add_gnomAD(df, gnomAD_path.replace('{chrom}', chrom), cache_dir)
+            df.to_csv(f"{output_name}_{chrom}.tsv", sep='\t')
+            print(f'Done {chrom}.')
+    else:
+        df = main(input_files, chrom)
+        df = add_gnomAD(df, gnomAD_path, cache_dir)
+        df.to_csv(f"{output_name}.tsv", sep='\t')
     print('Done concatenation and gnomAD addition.')
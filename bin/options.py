@@ -0,0 +1,65 @@
+"""
+Command line options of hot_peaks_table.py.
+
+Only the standard library (and bin/workers.py) is imported here, so the command
+line is parsed, and --help or a usage error answered, before hot_peaks_table.py
+loads pandas and the analysis modules. The option defaults mirror the constants
+of the modules that use them (see tests/test_options.py).
+"""
+
+import argparse
+
+import bin.workers as workers_pool
+
+# Gonen_func.OUTPUT_FORMATS
+OUTPUT_FORMATS = ('xlsx', 'parquet', 'feather', 'tsv.gz')
+# result_cache.CACHE_DIR_NAME and result_cache.DEFAULT_MAX_GB
+CACHE_DIR_NAME = '.hot_peaks_cache'
+DEFAULT_MAX_GB = 10
+# hotspots.DEFAULT_STEP
+DEFAULT_HOTSPOT_STEP = 2000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate the hot peaks table of a variant CSV.")
+    parser.add_argument('var_csv_path', help="Path to the CSV (or Parquet/Feather) file containing variant data.")
+    parser.add_argument('sample_metadata_path', help="Path to the Excel file containing sample metadata.")
+    parser.add_argument('output_path', help="Path for saving the output Excel file.")
+    parser.add_argument('upload_path', nargs='?', default="", help="Path for uploading the output Excel file.")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Stream the variant CSV in chunks of this many rows (the CSV must be sorted by --sort-key).")
+    parser.add_argument('--sort-key', choices=['INTERVAL_ID', 'CHROM'], default='INTERVAL_ID',
+                        help="Column the variant CSV is sorted by, for --chunksize.")
+    parser.add_argument('--output-format', nargs='+', choices=OUTPUT_FORMATS, default=['xlsx'],
+                        help="Output formats. The Excel file is capped at Excel's row limit, the others keep every interval.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of workers (default: the available CPUs).")
+    parser.add_argument('--backend', choices=workers_pool.BACKENDS, default=workers_pool.DEFAULT_BACKEND,
+                        help="Run the interval statistics in a process pool, a thread pool or serially.")
+    parser.add_argument('--cache', nargs='?', const='', default=None, metavar='CACHE_DIR',
+                        help=f"Cache the parsed variant file (default directory: {CACHE_DIR_NAME} next to it), "
+                             "so a run with only a new sample metadata file doesn't parse it again.")
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_GB,
+                        help="Cache size limit in GB; the least recently used entries are evicted.")
+    parser.add_argument('--update', default=None, metavar='PREVIOUS_RESULT',
+                        help="Add the samples of the variant file (only new samples) to a previous result "
+                             "saved as parquet, feather or tsv.gz; the metadata file lists all the samples.")
+    parser.add_argument('--report', nargs='?', const='', default=None, metavar='REPORT_PATH',
+                        help="Save a JSON run report with the time, peak RSS, sizes and worker utilization "
+                             "of every stage (default path: OUTPUT_PATH_run_report.json).")
+    parser.add_argument('--sparse', action='store_true',
+                        help="Keep only the genotype carriers (for tables of rare variants) instead of packed presence bits.")
+    parser.add_argument('--enrichment', action='store_true',
+                        help="Add the proband enrichment of every interval: odds ratio, Fisher p-value and BH q-value.")
+    parser.add_argument('--permutations', type=int, default=0,
+                        help="Add label permutation p-values of this many permutations (implies --enrichment).")
+    parser.add_argument('--hotspots', type=int, default=None, metavar='WINDOW',
+                        help="Also report the sliding windows of WINDOW bases where proband carriers are "
+                             "over-represented (OUTPUT_PATH_hotspots). Whole CSV and Parquet/Feather inputs.")
+    parser.add_argument('--hotspot-step', type=int, default=DEFAULT_HOTSPOT_STEP,
+                        help="Distance between the hotspot window starts.")
+    parser.add_argument('--segregation', action='store_true',
+                        help="Add the trio counts of every interval: inherited and putative de novo proband "
+                             "carriers and maternal / paternal carriers (metadata 'family' column).")
+    parser.add_argument('--profile', action='store_true',
+                        help="Save cProfile dumps (.prof) and summaries (.txt) of every stage in OUTPUT_PATH_profile.")
+    return parser.parse_args(argv)
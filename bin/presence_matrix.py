@@ -0,0 +1,309 @@
+"""
+Bit-packed genotype presence matrix.
+
+Stores the "does this sample carry this variant" table of a variant dataframe as
+a variants x samples bit matrix (np.packbits along the sample axis), which takes
+about 1/8 of the memory of a boolean DataFrame. Per-sample, per-variant and
+per-interval counts are popcounts over the packed bytes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from bin.genotypes import GT_MISSING
+
+GT_SUFFIX = ':GT'
+MISSING_GT = (' ', '')
+ROW_CHUNK = 65536
+
+# number of set bits in every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(packed):
+    """
+    Count the set bits in every row of a packed bit matrix.
+
+    Parameters:
+        packed (ndarray): uint8 matrix (or vector) of packed bits.
+
+    Returns:
+        ndarray: int64 number of set bits per row.
+    """
+    return _POPCOUNT[packed].sum(axis=-1, dtype=np.int64)
+
+
+def gt_presence(values):
+    """
+    Check which genotype values are present (not NaN, ' ' or '', or not GT_MISSING
+    for the int8 GT codes written by clean_tsv.py).
+
+    Parameters:
+        values (array-like): Genotype strings or GT codes, any shape.
+
+    Returns:
+        ndarray: Boolean array of the same shape, True where a genotype exists.
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        return values != GT_MISSING
+    values = values.astype(object, copy=False)
+    missing = pd.isna(values)
+    for null in MISSING_GT:
+        missing |= values == null
+    return ~missing
+
+
+def _segment_starts(sorted_codes):
+    # first position of every run of equal (non-negative) codes
+    return np.flatnonzero(np.diff(sorted_codes, prepend=-1))
+
+
+def arrow_gt_presence(column):
+    """
+    Check which genotype values of an Arrow column are present.
+
+    Works on the Arrow buffers, without converting the genotypes to Python strings.
+
+    Parameters:
+        column (ChunkedArray): Genotype column of an Arrow table.
+
+    Returns:
+        ndarray: Boolean array, True where a genotype exists.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_integer(column.type):
+        present = pc.not_equal(column, GT_MISSING)
+        return np.asarray(pc.fill_null(present, False), dtype=bool)
+    if not pa.types.is_string(column.type):
+        column = column.cast(pa.string())
+    present = pc.and_(pc.is_valid(column), pc.invert(pc.is_in(column, value_set=pa.array(MISSING_GT))))
+    return np.asarray(pc.fill_null(present, False), dtype=bool)
+
+
+def get_gt_columns(columns):
+    """
+    Get the genotype columns of a variant table.
+
+    Parameters:
+        columns (list): Column names of the variant table.
+
+    Returns:
+        list: Names of the columns ending with 'GT'.
+    """
+    return [i for i in columns if i.endswith('GT')]
+
+
+class PresenceMatrix:
+    """
+    Variants x samples presence bits, packed 8 samples per byte.
+
+    Bit j of row i is set when sample j has a genotype for variant i.
+    """
+
+    def __init__(self, packed, samples):
+        self.packed = packed
+        self.samples = pd.Index(samples)
+
+    @classmethod
+    def from_bool(cls, values, samples):
+        """
+        Pack a boolean variants x samples matrix.
+
+        Parameters:
+            values (array-like): Boolean matrix, one column per sample.
+            samples (list): Sample names.
+
+        Returns:
+            PresenceMatrix: The packed matrix.
+        """
+        return cls(np.packbits(np.asarray(values, dtype=bool), axis=1), samples)
+
+    @classmethod
+    def from_gt_frame(cls, df, chunksize=ROW_CHUNK):
+        """
+        Build the presence matrix from the ':GT' columns of a variant dataframe.
+
+        The genotype block is tested and packed ROW_CHUNK rows at a time, so the
+        full boolean table is never materialized. Integer (GT code) columns are
+        tested as a numeric block, without going through objects.
+
+        Parameters:
+            df (DataFrame): Input dataframe containing variant information.
+            chunksize (int): Number of rows packed at a time.
+
+        Returns:
+            PresenceMatrix: Presence of every variant in every sample.
+        """
+        gt_columns = get_gt_columns(df.columns)
+        positions = [df.columns.get_loc(i) for i in gt_columns]
+        samples = [i.replace(GT_SUFFIX, '') for i in gt_columns]
+        is_coded = all(pd.api.types.is_integer_dtype(df[i]) for i in gt_columns)
+
+        packed = np.zeros((df.shape[0], (len(samples) + 7) // 8), dtype=np.uint8)
+        for start in range(0, df.shape[0], chunksize):
+            block = df.iloc[start:start + chunksize, positions]
+            block = block.to_numpy() if is_coded else block.to_numpy(dtype=object)
+            packed[start:start + chunksize] = np.packbits(gt_presence(block), axis=1)
+        return cls(packed, samples)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """
+        Build the presence matrix from the ':GT' columns of an Arrow table.
+
+        Every column is tested on its Arrow buffers and OR-ed into its bit of the
+        packed matrix, so neither object strings nor a full boolean table are created.
+
+        Parameters:
+            table (pyarrow.Table): Variant table with the ':GT' columns.
+
+        Returns:
+            PresenceMatrix: Presence of every variant in every sample.
+        """
+        gt_columns = get_gt_columns(table.column_names)
+        samples = [i.replace(GT_SUFFIX, '') for i in gt_columns]
+
+        packed = np.zeros((table.num_rows, (len(samples) + 7) // 8), dtype=np.uint8)
+        for j, name in enumerate(gt_columns):
+            packed[:, j // 8] |= arrow_gt_presence(table.column(name)).astype(np.uint8) << (7 - j % 8)
+        return cls(packed, samples)
+
+    @property
+    def n_variants(self):
+        return self.packed.shape[0]
+
+    @property
+    def n_samples(self):
+        return len(self.samples)
+
+    @property
+    def shape(self):
+        return self.n_variants, self.n_samples
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def sample_mask(self, mask):
+        """
+        Pack a boolean sample mask to match the matrix rows.
+
+        Parameters:
+            mask (array-like): Boolean mask over the samples.
+
+        Returns:
+            ndarray: Packed uint8 mask.
+        """
+        return np.packbits(np.asarray(mask, dtype=bool))
+
+    def to_bool(self, start=0, stop=None):
+        """
+        Unpack rows [start, stop) to a boolean matrix.
+
+        Returns:
+            ndarray: Boolean variants x samples matrix.
+        """
+        bits = np.unpackbits(self.packed[start:stop], axis=1, count=self.n_samples)
+        return bits.astype(bool)
+
+    def to_frame(self, index=None):
+        """
+        Unpack the matrix to a boolean DataFrame with one column per sample.
+
+        Parameters:
+            index (Index, optional): Row index of the returned DataFrame.
+
+        Returns:
+            DataFrame: Boolean table indicating presence of variants in samples.
+        """
+        return pd.DataFrame(self.to_bool(), index=index, columns=self.samples)
+
+    def variant_counts(self, mask=None):
+        """
+        Count the carriers of every variant.
+
+        Parameters:
+            mask (array-like, optional): Boolean sample mask to count only some samples.
+
+        Returns:
+            ndarray: int64 number of carrier samples per variant.
+        """
+        if mask is None:
+            return popcount(self.packed)
+        return popcount(self.packed & self.sample_mask(mask))
+
+    def sample_counts(self, chunksize=ROW_CHUNK):
+        """
+        Count the variants of every sample.
+
+        Returns:
+            Series: Number of variants carried by each sample.
+        """
+        counts = np.zeros(self.n_samples, dtype=np.int64)
+        for start in range(0, self.n_variants, chunksize):
+            counts += self.to_bool(start, start + chunksize).sum(axis=0)
+        return pd.Series(counts, index=self.samples)
+
+    def carriers(self, sample):
+        """
+        Get the variants carried by a sample.
+
+        Parameters:
+            sample (str): Sample name.
+
+        Returns:
+            ndarray: Row positions of the variants present in the sample.
+        """
+        j = self.samples.get_loc(sample)
+        return np.flatnonzero(self.packed[:, j // 8] & (0x80 >> (j % 8)))
+
+    def __sorted_rows(self, codes):
+        # rows grouped by interval code, without the rows that have no interval
+        order = np.argsort(codes, kind='stable')
+        order = order[codes[order] >= 0]
+        sorted_codes = codes[order]
+        return order, sorted_codes, _segment_starts(sorted_codes)
+
+    def interval_presence(self, codes, n_intervals):
+        """
+        OR the variant rows of every interval together.
+
+        Parameters:
+            codes (ndarray): Interval code of every variant (-1 for no interval).
+            n_intervals (int): Number of intervals.
+
+        Returns:
+            PresenceMatrix: Intervals x samples matrix, bit set when the sample
+            has any variant in the interval.
+        """
+        order, sorted_codes, starts = self.__sorted_rows(codes)
+        packed = np.zeros((n_intervals, self.packed.shape[1]), dtype=np.uint8)
+        if len(order):
+            packed[sorted_codes[starts]] = np.bitwise_or.reduceat(self.packed[order], starts, axis=0)
+        return PresenceMatrix(packed, self.samples)
+
+    def interval_sums(self, codes, n_intervals, chunksize=ROW_CHUNK):
+        """
+        Count the variants of every sample in every interval.
+
+        Parameters:
+            codes (ndarray): Interval code of every variant (-1 for no interval).
+            n_intervals (int): Number of intervals.
+            chunksize (int): Number of rows unpacked at a time.
+
+        Returns:
+            ndarray: int64 intervals x samples variant counts.
+        """
+        order, sorted_codes, _ = self.__sorted_rows(codes)
+        sums = np.zeros((n_intervals, self.n_samples), dtype=np.int64)
+        for start in range(0, len(order), chunksize):
+            rows = order[start:start + chunksize]
+            chunk_codes = sorted_codes[start:start + chunksize]
+            starts = _segment_starts(chunk_codes)
+            bits = np.unpackbits(self.packed[rows], axis=1, count=self.n_samples)
+            # an interval split between two chunks is accumulated from both
+            sums[chunk_codes[starts]] += np.add.reduceat(bits, starts, axis=0, dtype=np.int64)
+        return sums
@@ -0,0 +1,183 @@
+"""
+Content-addressed cache of the parsed variant table.
+
+The interval statistics only depend on the pedigree through the sample groups,
+so for a given variant file we keep the interval info table and the
+per-interval sample counts, keyed by a hash of the file content. A later run
+with the same variant file (e.g. after a metadata sheet change) regroups the
+cached counts instead of parsing the file again.
+
+Entries are directories under the cache directory (by default next to the
+input). The cache is capped at max_bytes: the least recently used entries are
+evicted when a new entry is stored.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR_NAME = '.hot_peaks_cache'
+# bump when the stored layout or the parsing of the variant files changes
+CACHE_VERSION = 1
+DEFAULT_MAX_GB = 10
+HASH_BLOCK = 1 << 20
+HASHES_FILE = 'hashes.json'
+INFO_FILE = 'info.pkl.gz'
+SUMS_FILE = 'sums.pkl.gz'
+PICKLE_COMPRESSION = {'method': 'gzip', 'compresslevel': 1}
+
+
+def get_default_cache_dir(path):
+    """
+    Cache directory next to a variant file.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+
+
+def hash_file(path):
+    """
+    Hash the content of a file.
+
+    Parameters:
+        path (str): Path to the file.
+
+    Returns:
+        str: Hex SHA-1 of the cache version and the file content.
+    """
+    digest = hashlib.sha1(f'v{CACHE_VERSION}'.encode())
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Size-capped cache of the interval sums of variant files.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_GB * 1024 ** 3):
+        """
+        Parameters:
+            cache_dir (str): Directory of the cache entries, created when needed.
+            max_bytes (int): Total size of the entries to keep.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def __entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def __entry_size(self, key):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(self.__entry_path(key)) for name in names)
+
+    def key(self, path):
+        """
+        Get the cache key of a variant file.
+
+        The content hash is remembered by the file's path, size and modification
+        time, so an unchanged file is not read again to compute its key.
+
+        Parameters:
+            path (str): Path to the variant file.
+
+        Returns:
+            str: The content hash of the file.
+        """
+        hashes_path = os.path.join(self.cache_dir, HASHES_FILE)
+        hashes = {}
+        if os.path.exists(hashes_path):
+            with open(hashes_path) as file:
+                hashes = json.load(file)
+
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        known = hashes.get(os.path.abspath(path))
+        if known is not None and known['signature'] == signature:
+            return known['key']
+
+        key = hash_file(path)
+        hashes[os.path.abspath(path)] = {'signature': signature, 'key': key}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(hashes_path, 'w') as file:
+            json.dump(hashes, file)
+        return key
+
+    def load_sums(self, key):
+        """
+        Load the interval info table and interval sample counts of a key.
+
+        Returns:
+            tuple: (info, sums) DataFrames indexed by INTERVAL_ID, or None when not cached.
+        """
+        entry = self.__entry_path(key)
+        if not os.path.isdir(entry):
+            return None
+        # mark the entry as recently used for the eviction
+        os.utime(entry)
+        return (pd.read_pickle(os.path.join(entry, INFO_FILE)),
+                pd.read_pickle(os.path.join(entry, SUMS_FILE)).astype(np.int64))
+
+    def store(self, key, info, sums):
+        """
+        Store the parsed variant table of a key and evict old entries over the size limit.
+
+        Parameters:
+            key (str): Cache key of the variant file.
+            info (DataFrame): Interval info table, indexed by INTERVAL_ID.
+            sums (DataFrame): Interval x sample variant counts, indexed by INTERVAL_ID.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            info.to_pickle(os.path.join(temp_dir, INFO_FILE), compression=PICKLE_COMPRESSION)
+            # the counts fit the smallest unsigned type of their maximum
+            dtype = np.min_scalar_type(int(sums.to_numpy().max(initial=0)))
+            sums.astype(dtype).to_pickle(os.path.join(temp_dir, SUMS_FILE), compression=PICKLE_COMPRESSION)
+
+            entry = self.__entry_path(key)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.rename(temp_dir, entry)
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        self.evict()
+
+    def entries(self):
+        """
+        List the cache entries, least recently used first.
+
+        Returns:
+            list: (key, size in bytes) of every entry.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        keys = [name for name in os.listdir(self.cache_dir)
+                if not name.startswith('.') and os.path.isdir(self.__entry_path(name))]
+        keys.sort(key=lambda key: os.path.getmtime(self.__entry_path(key)))
+        return [(key, self.__entry_size(key)) for key in keys]
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits max_bytes.
+
+        Returns:
+            list: The evicted keys.
+        """
+        entries = self.entries()
+        total = sum(size for _, size in entries)
+        evicted = []
+        for key, size in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self.__entry_path(key))
+            total -= size
+            evicted.append(key)
+        return evicted
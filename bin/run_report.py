@@ -0,0 +1,188 @@
+"""
+Per-stage instrumentation of the hot peaks pipeline.
+
+`RunReport.stage` times a stage of the run (wall and CPU time of the process and
+its worker processes), records its memory and the rows / columns the stage sets
+on its record, and can run it under cProfile. On Linux the peak RSS (VmHWM) is
+reset before every stage, so its 'peak_rss_mb' is the peak of that stage alone;
+elsewhere only the process high-water mark ('rss_high_water_mb') is known. The
+report is saved as JSON, e.g.:
+
+    report = RunReport()
+    with report.stage('read_variants') as record:
+        df = pd.read_csv(path)
+        record['rows'], record['columns'] = df.shape
+    report.save('run_report.json')
+"""
+
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+# functions listed in the text summary of a stage profile
+PROFILE_TOP_N = 40
+# ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+PROC_STATUS = '/proc/self/status'
+PROC_CLEAR_REFS = '/proc/self/clear_refs'
+# written to clear_refs, resets VmHWM (and ru_maxrss) to the current RSS
+RESET_PEAK_RSS = '5'
+
+
+def get_peak_rss_mb(who=resource.RUSAGE_SELF):
+    """
+    Peak resident set size so far, in MB.
+
+    Parameters:
+        who (int): resource.RUSAGE_SELF, or RUSAGE_CHILDREN for the largest finished child process.
+    """
+    return resource.getrusage(who).ru_maxrss * RSS_UNIT / 1024 ** 2
+
+
+def get_proc_rss_mb(field='VmRSS'):
+    """
+    Current (VmRSS) or peak (VmHWM) resident set size of this process from /proc, in MB.
+
+    Returns:
+        float: The size, or None where /proc/self/status isn't available.
+    """
+    try:
+        with open(PROC_STATUS) as file:
+            for line in file:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """
+    Reset the peak RSS of this process to its current RSS (Linux only).
+
+    Returns:
+        bool: Whether the peak was reset.
+    """
+    try:
+        with open(PROC_CLEAR_REFS, 'w') as file:
+            file.write(RESET_PEAK_RSS)
+        return True
+    except OSError:
+        return False
+
+
+def get_cpu_seconds():
+    """
+    User + system time of this process and of its finished child processes.
+    """
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(i.ru_utime + i.ru_stime for i in usage)
+
+
+class RunReport:
+    """
+    Timing, memory and size records of the stages of a run.
+    """
+
+    def __init__(self, profile_dir=None, parameters=None):
+        """
+        Parameters:
+            profile_dir (str, optional): Save a cProfile dump ('<stage>.prof') and its text
+                summary ('<stage>.txt') of every stage in this directory. Defaults to None (no profiling).
+            parameters (dict, optional): Run parameters to include in the report.
+        """
+        self.profile_dir = profile_dir
+        self.parameters = parameters or {}
+        self.stages = []
+        self.started = datetime.datetime.now()
+        self.__start = time.perf_counter()
+        # resetting the peak RSS for every stage also resets ru_maxrss, so the run's peak is kept here
+        self.__peak_rss = get_peak_rss_mb()
+
+    def __save_profile(self, name, profiler):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, name)
+        profiler.dump_stats(f'{path}.prof')
+        with open(f'{path}.txt', 'w') as file:
+            pstats.Stats(profiler, stream=file).sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+
+    @contextmanager
+    def stage(self, name, workers=1):
+        """
+        Record a stage of the run.
+
+        The record gets the stage's wall / CPU time and worker utilization, its peak RSS
+        (None where it can't be reset), its RSS increase from start to end and the process
+        (and finished children) RSS high-water marks.
+
+        Parameters:
+            name (str): Stage name.
+            workers (int): Workers the stage runs on, for the worker utilization
+                (CPU time over wall time times workers).
+
+        Yields:
+            dict: The stage record, to add e.g. 'rows' and 'columns' to.
+        """
+        record = {'stage': name}
+        profiler = cProfile.Profile() if self.profile_dir else None
+        self.__peak_rss = max(self.__peak_rss, get_peak_rss_mb())
+        is_reset = reset_peak_rss()
+        start_rss = get_proc_rss_mb()
+        start, start_cpu = time.perf_counter(), get_cpu_seconds()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        except BaseException:
+            record['failed'] = True
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.__save_profile(name, profiler)
+            wall, cpu = time.perf_counter() - start, get_cpu_seconds() - start_cpu
+            stage_peak = get_proc_rss_mb('VmHWM') if is_reset else None
+            end_rss = get_proc_rss_mb()
+            self.__peak_rss = max(self.__peak_rss, get_peak_rss_mb())
+            record.update({'wall_s': round(wall, 3),
+                           'cpu_s': round(cpu, 3),
+                           'workers': workers,
+                           'worker_utilization': round(cpu / (wall * workers), 3) if wall > 0 else None,
+                           'peak_rss_mb': round(stage_peak, 1) if stage_peak is not None else None,
+                           'rss_increase_mb': round(end_rss - start_rss, 1) if start_rss is not None else None,
+                           'rss_high_water_mb': round(self.__peak_rss, 1),
+                           'children_rss_high_water_mb': round(get_peak_rss_mb(resource.RUSAGE_CHILDREN), 1)})
+            self.stages.append(record)
+            if stage_peak is not None:
+                print(f"{name}: {wall:.1f}s, peak RSS {stage_peak:.0f} MB")
+            else:
+                print(f"{name}: {wall:.1f}s, RSS high water {self.__peak_rss:.0f} MB")
+
+    def to_dict(self):
+        """
+        The report as a JSON serializable dict.
+        """
+        return {'started': self.started.isoformat(timespec='seconds'),
+                'wall_s': round(time.perf_counter() - self.__start, 3),
+                'peak_rss_mb': round(max(self.__peak_rss, get_peak_rss_mb()), 1),
+                'parameters': self.parameters,
+                'stages': self.stages}
+
+    def save(self, path):
+        """
+        Save the report as JSON.
+
+        Parameters:
+            path (str): Path of the JSON file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
@@ -0,0 +1,116 @@
+"""
+Family-aware segregation counts of the intervals.
+
+The 'n non-DSD' statistics mix the unaffected parents with unrelated controls.
+For the probands whose parents are sequenced too, the trios of the pedigree
+(`CohortIndex.trios`, from its family and fam_relation columns) give the
+proband / mother / father column of every trio as index arrays, built once. They
+are inverted to the (trio, role) of every sample column, so every carrier of the
+sparse carrier lists (see bin/carrier_matrix.py) is a proband, mother or father
+bit of a (variant, trio) pair, and the segregation of all the trios is a few
+array operations on those bits:
+
+    inherited          proband and at least one parent carry the variant
+    putative de novo   proband carries it, both parents are sequenced and don't
+    maternal/paternal  the mother / father of the trio carries it
+
+Every count is the number of trios with such a variant in the interval, so a
+parent shared by two probands (siblings) is counted in both trios.
+"""
+
+import numpy as np
+import pandas as pd
+
+from bin.carrier_matrix import CarrierMatrix
+from bin.cohort_index import get_cohort_index
+from bin.interval_stats import TOTAL_LABEL, get_interval_codes
+
+SEGREGATION_NAMES = ['n trio probands', 'n inherited', 'n putative de novo', 'n maternal carriers',
+                     'n paternal carriers']
+PROBAND_BIT, MOTHER_BIT, FATHER_BIT = 1, 2, 4
+
+
+def get_segregation_columns(columns):
+    """
+    Get the segregation columns ('<label> n inherited', ...) of a result table.
+    """
+    return [col for col in columns if any(str(col).endswith(f' {name}') for name in SEGREGATION_NAMES)]
+
+
+def __sample_roles(n_samples, probands, mothers, fathers):
+    # (trio, role bit) of every sample column, grouped by column: column i has the roles [starts[i], starts[i + 1])
+    trios = np.arange(len(probands))
+    columns = np.concatenate([probands, mothers, fathers])
+    roles = np.concatenate([trios, trios, trios])
+    bits = np.repeat(np.array([PROBAND_BIT, MOTHER_BIT, FATHER_BIT], dtype=np.int8), len(probands))
+    kept = np.flatnonzero(columns >= 0)
+    kept = kept[np.argsort(columns[kept], kind='stable')]
+    starts = np.searchsorted(columns[kept], np.arange(n_samples + 1))
+    return starts, roles[kept], bits[kept]
+
+
+def __trio_bits(carriers, codes, probands, mothers, fathers):
+    # (variant, trio) pairs with a carrier in the trio and the OR of the carriers' role bits
+    starts, roles, bits = __sample_roles(carriers.n_samples, probands, mothers, fathers)
+    rows, cols = carriers.to_coo()
+    in_interval = codes[rows] >= 0
+    rows, cols = rows[in_interval], cols[in_interval]
+    lengths = starts[cols + 1] - starts[cols]
+    positions = np.repeat(starts[cols], lengths) + np.arange(lengths.sum()) \
+        - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    keys = np.repeat(rows.astype(np.int64), lengths) * len(probands) + roles[positions]
+    if not len(keys):
+        return keys, bits[:0]
+
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    first = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[first], np.bitwise_or.reduceat(bits[positions][order], first)
+
+
+def has_complete_trios(cohort):
+    """
+    Check whether a cohort has a trio with both parents (a proband, mother and father in a family).
+    """
+    trios = get_cohort_index(cohort).trios
+    return bool(((trios[:, 1] >= 0) & (trios[:, 2] >= 0)).any())
+
+
+def interval_segregation(matrix, interval_ids, cohort):
+    """
+    Count the segregation of the variants of every interval in the trios, overall and per source.
+
+    Parameters:
+        matrix (PresenceMatrix or CarrierMatrix): Presence of every variant in every sample.
+        interval_ids (array-like): INTERVAL_ID of every variant row.
+        cohort (CohortIndex or DataFrame): Sample groups, or the pedigree dataframe.
+
+    Returns:
+        DataFrame: The '<label> <SEGREGATION_NAMES>' int64 columns of total and every source
+        (of the proband), indexed by sorted INTERVAL_ID.
+    """
+    carriers = matrix if isinstance(matrix, CarrierMatrix) else CarrierMatrix.from_presence(matrix)
+    cohort = get_cohort_index(cohort)
+    codes, index = get_interval_codes(interval_ids)
+    probands, mothers, fathers, sources = cohort.trio_columns(carriers.samples)
+    n_trios = max(len(probands), 1)
+
+    keys, bits = __trio_bits(carriers, codes, probands, mothers, fathers)
+    rows, trios = np.divmod(keys, n_trios)
+    proband, mother, father = (bits & PROBAND_BIT) > 0, (bits & MOTHER_BIT) > 0, (bits & FATHER_BIT) > 0
+    complete = (mothers[trios] >= 0) & (fathers[trios] >= 0)
+    flags = [proband, proband & (mother | father), proband & ~mother & ~father & complete, mother, father]
+
+    labels = [TOTAL_LABEL] + list(cohort.labels)
+    counts = np.zeros((len(labels), len(SEGREGATION_NAMES), len(index)), dtype=np.int64)
+    for i, flag in enumerate(flags):
+        # the trios with such a variant in every interval
+        interval_codes, flag_trios = np.divmod(np.unique(codes[rows[flag]].astype(np.int64) * n_trios + trios[flag]),
+                                               n_trios)
+        counts[0, i] = np.bincount(interval_codes, minlength=len(index))
+        trio_sources = sources[flag_trios]
+        for j in range(len(cohort.labels)):
+            counts[1 + j, i] = np.bincount(interval_codes[trio_sources == j], minlength=len(index))
+
+    return pd.DataFrame({f'{label} {name}': counts[i, j] for i, label in enumerate(labels)
+                         for j, name in enumerate(SEGREGATION_NAMES)}, index=index)
@@ -0,0 +1,77 @@
+"""
+Columnar (Parquet / Feather) input for the variant tables.
+
+The cleaned variant tables written by clean_tsv.py are Parquet files. Reading
+them through pyarrow lets us project only the columns the analysis needs
+(INTERVAL_ID, the interval info columns and the ':GT' columns), so the DP/GQ
+columns are never parsed.
+"""
+
+import os
+
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+FEATHER_SUFFIXES = ('.feather', '.arrow', '.ipc')
+
+
+def get_columnar_format(path):
+    """
+    Detect the columnar format of a variant table from its file name.
+
+    Parameters:
+        path (str): Path to the variant table.
+
+    Returns:
+        str: 'parquet', 'feather' or None for any other (CSV) input.
+    """
+    name = os.path.basename(path).lower()
+    if name.endswith(PARQUET_SUFFIXES):
+        return 'parquet'
+    if name.endswith(FEATHER_SUFFIXES):
+        return 'feather'
+    return None
+
+
+def is_columnar(path):
+    return get_columnar_format(path) is not None
+
+
+def read_schema(path):
+    """
+    Read the schema of a Parquet / Feather file without reading its data.
+
+    Parameters:
+        path (str): Path to the variant table.
+
+    Returns:
+        pyarrow.Schema: The file schema.
+    """
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+
+    if get_columnar_format(path) == 'parquet':
+        return pq.read_schema(path)
+    with ipc.open_file(path) as reader:
+        return reader.schema
+
+
+def read_variant_columns(path, columns):
+    """
+    Read a Parquet / Feather variant table with column projection.
+
+    Parameters:
+        path (str): Path to the variant table.
+        columns (list): Non-genotype columns to read. Every ':GT' column is read as well.
+
+    Returns:
+        pyarrow.Table: The projected table.
+    """
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+
+    names = read_schema(path).names
+    gt_columns = [i for i in names if i.endswith('GT')]
+    projection = [i for i in columns if i not in gt_columns] + gt_columns
+
+    if get_columnar_format(path) == 'parquet':
+        return pq.read_table(path, columns=projection)
+    return feather.read_table(path, columns=projection)
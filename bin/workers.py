@@ -0,0 +1,73 @@
+"""
+Worker pools for the block-parallel analysis stages.
+
+A stage is split into independent blocks (e.g. groups of whole intervals) and
+`map_blocks` runs a module-level function over them with a process pool, a
+thread pool or serially. Data shared by all blocks (the pedigree-derived group
+masks) is passed once per worker through the pool initializer, not once per task.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+BACKENDS = ('process', 'thread', 'serial')
+DEFAULT_BACKEND = 'process'
+# blocks per worker, so uneven blocks still balance between the workers
+BLOCKS_PER_WORKER = 4
+
+__payload = {}
+
+
+def get_default_workers():
+    """
+    Number of CPUs this process may run on.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def __set_payload(payload):
+    # pool initializer: keep the shared data in the worker's module state
+    global __payload
+    __payload = payload
+
+
+def __run_block(func, block):
+    return func(block, **__payload)
+
+
+def get_n_blocks(workers, backend):
+    """
+    Number of blocks to split a stage into for the given workers and backend.
+    """
+    if backend == 'serial' or workers <= 1:
+        return 1
+    return workers * BLOCKS_PER_WORKER
+
+
+def map_blocks(func, blocks, payload, backend=DEFAULT_BACKEND, workers=None):
+    """
+    Run func(block, **payload) over every block.
+
+    Parameters:
+        func (callable): Module-level function (picklable for the process backend).
+        blocks (list): The blocks to process.
+        payload (dict): Keyword arguments shared by all blocks, sent once per worker.
+        backend (str): 'process', 'thread' or 'serial'.
+        workers (int, optional): Number of workers. Defaults to the available CPUs.
+
+    Returns:
+        list: The result of every block, in order.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+    workers = min(workers or get_default_workers(), len(blocks))
+
+    if backend == 'serial' or workers <= 1:
+        return [func(block, **payload) for block in blocks]
+    if backend == 'thread':
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda block: func(block, **payload), blocks))
+    with ProcessPoolExecutor(max_workers=workers, initializer=__set_payload, initargs=(payload,)) as executor:
+        return list(executor.map(__run_block, [func] * len(blocks), blocks))
@@ -0,0 +1,271 @@
+"""
+Script Description:
+-------------------
+Runs the hot peaks pipeline independently per chromosome shard, then merges the shards.
+
+Map: for every chromosome, bin/merge_chrom.py merges the sample TSVs and adds gnomAD,
+ bin/clean_tsv.py writes the cleaned Parquet, and the interval statistics and DSD
+ distances of hot_peaks_table.py are saved as the shard's interval table
+ (WORK_DIR/<chrom>/hot_peaks.parquet). Intervals don't span chromosomes, so every
+ shard is complete on its own.
+Reduce: the shard tables are concatenated and saved with the report headers, giving
+ the same table as a single run on all the chromosomes.
+
+The shards run as parallel local processes (--jobs), or as batch jobs: --batch-dir
+ writes a SLURM script per shard, a reduce script and submit.sh, which submits the
+ shards and the reduce step after all of them.
+
+Usage:
+------
+python hot_peaks_shards.py run SAMPLE_METADATA_PATH OUTPUT_PATH --inputs SAMPLE.tsv [...] --gnomad GNOMAD_PATH
+    [--work-dir DIR] [--chroms chr1 ...] [--jobs N] [--batch-dir DIR [--sbatch OPTION ...]]
+    [--chunksize N] [--sparse] [--output-format FORMAT ...] [--upload-path PATH]
+python hot_peaks_shards.py shard CHROM SAMPLE_METADATA_PATH --inputs SAMPLE.tsv [...] --gnomad GNOMAD_PATH [--work-dir DIR]
+python hot_peaks_shards.py reduce SAMPLE_METADATA_PATH OUTPUT_PATH [--work-dir DIR] [--chroms chr1 ...]
+
+Arguments:
+----------
+SAMPLE_METADATA_PATH (str): Path to the Excel file containing sample metadata (pedigree information).
+OUTPUT_PATH (str): Path of the merged output table (the date and format extension are added).
+--inputs (str): The per-sample variant TSVs (with the layer columns), as given to bin/merge_chrom.py.
+--gnomad (str): gnomAD extract or index directory; a '{chrom}' in the path is replaced by the shard's chromosome.
+--work-dir (str, optional): Directory of the shard files. Defaults to hot_peaks_shards.
+--chroms (str, optional): Chromosomes to run. Defaults to chr1-22, chrX, chrY and chrM.
+--jobs (int, optional): Shards run at the same time by the local run. Defaults to the available CPUs.
+--batch-dir (str, optional): Write the SLURM job scripts here instead of running the shards.
+--sbatch (str, optional): Extra #SBATCH options of the job scripts, e.g. --sbatch=--mem=32G --sbatch=--time=8:00:00.
+--chunksize (int, optional): Stream the clean_tsv.py merge in chunks of N rows (the shard TSV is sorted).
+--sparse (optional): Compute the statistics on the sparse genotype carriers.
+
+Note:
+-----
+- The statistics of a shard run serially; the parallelism is across the shards.
+- A shard with no variants writes an empty table, which the reduce step skips.
+"""
+
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import bin.Gonen_func as gf
+import bin.workers as workers_pool
+import hot_peaks_table as hpt
+from bin.cohort_index import CohortIndex
+
+SCRIPT_PATH = os.path.abspath(__file__)
+BIN_DIR = os.path.join(os.path.dirname(SCRIPT_PATH), 'bin')
+# the chromosomes of bin/merge_chrom.py
+CHROMOSOMES = [f'chr{i}' for i in range(1, 23)] + ['chrX', 'chrY', 'chrM']
+DEFAULT_WORK_DIR = 'hot_peaks_shards'
+MERGED_NAME = 'merged'
+CLEAN_NAME = 'clean'
+SHARD_TABLE = 'hot_peaks.parquet'
+SUBMIT_SCRIPT = 'submit.sh'
+
+def get_shard_table_path(work_dir, chrom):
+    """
+    Path of the interval table of a chromosome shard.
+    """
+    return os.path.join(work_dir, chrom, SHARD_TABLE)
+
+def run_step(command):
+    """
+    Run a pipeline step as a subprocess, failing on a non-zero exit status.
+    """
+    print(shlex.join(command), flush=True)
+    subprocess.run(command, check=True)
+
+def run_shard(chrom, input_files, gnomAD_path, cohort, work_dir=DEFAULT_WORK_DIR, chunksize=None, sparse=False):
+    """
+    Run the whole pipeline on one chromosome (the map step).
+
+    Parameters:
+        chrom (str): Chromosome of the shard.
+        input_files (list): The per-sample variant TSVs.
+        gnomAD_path (str): gnomAD extract or index directory, '{chrom}' is replaced by the chromosome.
+        cohort (CohortIndex): Sample groups of the pedigree.
+        work_dir (str): Directory of the shard files.
+        chunksize (int, optional): Stream the clean_tsv.py merge in chunks of this many rows.
+        sparse (bool, optional): Compute the statistics on the sparse genotype carriers.
+
+    Returns:
+        str: Path of the shard's interval table.
+    """
+    shard_dir = os.path.join(work_dir, chrom)
+    os.makedirs(shard_dir, exist_ok=True)
+    merged = os.path.join(shard_dir, MERGED_NAME)
+    clean = os.path.join(shard_dir, CLEAN_NAME)
+
+    run_step([sys.executable, os.path.join(BIN_DIR, 'merge_chrom.py'), chrom, gnomAD_path.replace('{chrom}', chrom),
+              merged, *input_files])
+    run_step([sys.executable, os.path.join(BIN_DIR, 'clean_tsv.py'), clean, f'{merged}.tsv'] +
+             (['--chunksize', str(chunksize)] if chunksize else []))
+
+    result = hpt.analyze_columnar_peaks(f'{clean}.parquet', cohort, backend='serial', sparse=sparse)
+    if result.shape[0]:
+        result = hpt.add_dsd_distance(result)
+    table_path = get_shard_table_path(work_dir, chrom)
+    result.to_parquet(table_path)
+    print(f"Done {chrom}: {result.shape[0]} intervals", flush=True)
+    return table_path
+
+def reduce_shards(work_dir, chroms, cohort, output_file, upload_path=None, output_formats=('xlsx',)):
+    """
+    Concatenate the shard interval tables and save them with the report headers (the reduce step).
+
+    Parameters:
+        work_dir (str): Directory of the shard files.
+        chroms (list): Chromosomes of the shards.
+        cohort (CohortIndex): Sample groups of the pedigree, for the column group headers.
+        output_file (str): Path of the output table.
+        upload_path (str, optional): Path for uploading the output Excel file.
+        output_formats (list, optional): Output formats, see `Gonen_func.create_tables`.
+
+    Returns:
+        DataFrame: The merged table, indexed by INTERVAL_ID.
+    """
+    paths = {chrom: get_shard_table_path(work_dir, chrom) for chrom in chroms}
+    missing = [chrom for chrom, path in paths.items() if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"No shard table of {', '.join(missing)} in {work_dir}")
+
+    tables = [table for table in (pd.read_parquet(path) for path in paths.values()) if table.shape[0]]
+    result = pd.concat(tables).sort_index() if tables else pd.DataFrame()
+    if result.index.duplicated().any():
+        raise ValueError(f"Intervals in more than one shard: {list(result.index[result.index.duplicated()][:5])}")
+
+    hpt.save_to_excel(result, cohort, output_file, upload_path, output_formats)
+    return result
+
+def get_shard_command(chrom, args):
+    """
+    Command line running the shard of a chromosome, with the options of a `run`.
+    """
+    command = [sys.executable, SCRIPT_PATH, 'shard', chrom, args.sample_metadata_path,
+               '--inputs', *args.inputs, '--gnomad', args.gnomad, '--work-dir', args.work_dir]
+    if args.chunksize:
+        command += ['--chunksize', str(args.chunksize)]
+    if args.sparse:
+        command.append('--sparse')
+    return command
+
+def get_reduce_command(args):
+    """
+    Command line running the reduce step, with the options of a `run`.
+    """
+    command = [sys.executable, SCRIPT_PATH, 'reduce', args.sample_metadata_path, args.output_path,
+               '--work-dir', args.work_dir, '--chroms', *args.chroms, '--output-format', *args.output_format]
+    if args.upload_path:
+        command += ['--upload-path', args.upload_path]
+    return command
+
+def run_local(args):
+    """
+    Run the shards as parallel local processes, then the reduce step.
+    """
+    jobs = args.jobs or workers_pool.get_default_workers()
+    with ThreadPoolExecutor(jobs) as pool:
+        runs = {chrom: pool.submit(subprocess.run, get_shard_command(chrom, args)) for chrom in args.chroms}
+    failed = [chrom for chrom, run in runs.items() if run.result().returncode != 0]
+    if failed:
+        raise RuntimeError(f"Shards failed: {', '.join(failed)}")
+    run_step(get_reduce_command(args))
+
+def write_batch_jobs(args):
+    """
+    Write a SLURM job script per shard, the reduce job script and a submit script.
+
+    submit.sh submits the shards and then the reduce job, which waits for all of them
+    (--dependency=afterok). The scripts run from the current directory, so relative
+    paths keep working.
+
+    Returns:
+        str: Path of the submit script.
+    """
+    batch_dir = os.path.abspath(args.batch_dir)
+    os.makedirs(batch_dir, exist_ok=True)
+    cwd = os.getcwd()
+
+    def write_job(name, command):
+        path = os.path.join(batch_dir, f'{name}.sh')
+        header = [f'#SBATCH --job-name=hot_peaks_{name}', f'#SBATCH --output={os.path.join(batch_dir, name)}.log']
+        header += [f'#SBATCH {option}' for option in args.sbatch]
+        with open(path, 'w') as file:
+            file.write('\n'.join(['#!/bin/bash', *header, 'set -e', f'cd {shlex.quote(cwd)}', shlex.join(command)]) + '\n')
+        return path
+
+    lines = ['#!/bin/bash', 'set -e', 'ids=()']
+    for chrom in args.chroms:
+        path = write_job(f'shard_{chrom}', get_shard_command(chrom, args))
+        lines.append(f'ids+=($(sbatch --parsable {shlex.quote(path)}))')
+    path = write_job('reduce', get_reduce_command(args))
+    lines.append(f'sbatch --dependency=afterok:$(IFS=:; echo "${{ids[*]}}") {shlex.quote(path)}')
+
+    submit_path = os.path.join(batch_dir, SUBMIT_SCRIPT)
+    with open(submit_path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.chmod(submit_path, 0o755)
+    print(f"Submit the jobs with: bash {submit_path}")
+    return submit_path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the hot peaks pipeline per chromosome shard and merge the shards.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_shard_options(command):
+        command.add_argument('--inputs', nargs='+', required=True, help="The per-sample variant TSVs.")
+        command.add_argument('--gnomad', required=True,
+                             help="gnomAD extract or index directory, '{chrom}' is replaced by the chromosome.")
+        command.add_argument('--chunksize', type=int, default=None,
+                             help="Stream the clean_tsv.py merge in chunks of this many rows.")
+        command.add_argument('--sparse', action='store_true', help="Compute the statistics on the sparse carriers.")
+
+    def add_output_options(command):
+        command.add_argument('--output-format', nargs='+', choices=gf.OUTPUT_FORMATS, default=['xlsx'])
+        command.add_argument('--upload-path', default=None, help="Path for uploading the output Excel file.")
+
+    run = commands.add_parser('run', help="Run all the shards and the reduce step.")
+    run.add_argument('sample_metadata_path')
+    run.add_argument('output_path')
+    add_shard_options(run)
+    add_output_options(run)
+    run.add_argument('--jobs', type=int, default=None, help="Shards run at the same time (default: the available CPUs).")
+    run.add_argument('--batch-dir', default=None, help="Write SLURM job scripts here instead of running the shards.")
+    run.add_argument('--sbatch', action='append', default=[], metavar='OPTION',
+                     help="Extra #SBATCH option of the job scripts (repeatable), e.g. --sbatch=--mem=32G.")
+
+    shard = commands.add_parser('shard', help="Run the pipeline on one chromosome.")
+    shard.add_argument('chrom')
+    shard.add_argument('sample_metadata_path')
+    add_shard_options(shard)
+
+    reduce = commands.add_parser('reduce', help="Merge the shard tables into the output table.")
+    reduce.add_argument('sample_metadata_path')
+    reduce.add_argument('output_path')
+    add_output_options(reduce)
+
+    for command in (run, shard, reduce):
+        command.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help="Directory of the shard files.")
+    for command in (run, reduce):
+        command.add_argument('--chroms', nargs='+', default=CHROMOSOMES)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == 'run':
+        if args.batch_dir:
+            write_batch_jobs(args)
+        else:
+            run_local(args)
+    elif args.command == 'shard':
+        run_shard(args.chrom, args.inputs, args.gnomad, CohortIndex.read_excel(args.sample_metadata_path),
+                  args.work_dir, args.chunksize, args.sparse)
+    else:
+        reduce_shards(args.work_dir, args.chroms, CohortIndex.read_excel(args.sample_metadata_path),
+                      args.output_path, args.upload_path, args.output_format)
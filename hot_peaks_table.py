@@ -8,14 +8,41 @@ This script performs analysis on variant data and pedigree information,
 
 Usage:
 ------
-python hot_peaks_table.py.py VAR_CSV_PATH SAMPLE_METADATA_PATH OUTPUT_PATH [UPLOAD_PATH]
+python hot_peaks_table.py.py VAR_CSV_PATH SAMPLE_METADATA_PATH OUTPUT_PATH [UPLOAD_PATH] [--chunksize N [--sort-key INTERVAL_ID|CHROM]]
 
 Arguments:
 ----------
-VAR_CSV_PATH (str): Path to the CSV file containing variant data.
+VAR_CSV_PATH (str): Path to the CSV file containing variant data. Parquet/Feather files (.parquet, .feather) are
+    read with column projection: only INTERVAL_ID, the info columns and the ':GT' columns.
 SAMPLE_METADATA_PATH (str): Path to the Excel file containing sample metadata (pedigree information).
 OUTPUT_PATH (str): Path to the directory where the output Excel file will be saved.
 UPLOAD_PATH (str, optional): Path for uploading the output Excel file. Can be omitted.
+--chunksize (int, optional): Read the variant CSV in chunks of N rows instead of loading it whole.
+--sort-key (str, optional): Column the variant CSV is sorted by (INTERVAL_ID or CHROM), used with --chunksize.
+--output-format (str, optional): One or more of xlsx, parquet, feather, tsv.gz. Defaults to xlsx.
+    Parquet/Feather keep the column groups (Peak / Gene data / sources) as schema metadata.
+--workers (int, optional): Number of workers. Defaults to the available CPUs.
+--backend (str, optional): process, thread or serial worker pool. Defaults to process.
+--cache [CACHE_DIR] (optional): Cache the parsed variant file, keyed by its content, in CACHE_DIR
+    (default: .hot_peaks_cache next to the input). A re-run with a changed metadata file regroups the cached counts.
+--cache-size (float, optional): Cache size limit in GB, least recently used entries are evicted. Defaults to 10.
+--update PREVIOUS_RESULT (optional): Add the samples of VAR_CSV_PATH, which holds only new samples, to a previous
+    result saved as parquet/feather/tsv.gz. SAMPLE_METADATA_PATH lists all the samples, previous and new.
+--report [REPORT_PATH] (optional): Save a JSON run report - wall/CPU time, peak RSS, rows and columns and worker
+    utilization of every stage (default path: OUTPUT_PATH_run_report.json).
+--profile (optional): Save cProfile dumps and text summaries of every stage in OUTPUT_PATH_profile/.
+--sparse (optional): Keep only the genotype carriers (CSR lists) instead of the packed presence bits, so the
+    statistics of rare-variant tables scale with the carriers. Used for whole CSV and Parquet/Feather inputs.
+--enrichment (optional): Add the proband enrichment of every interval, overall and per source: odds ratio,
+    one-sided Fisher p-value and Benjamini-Hochberg q-value against the cohort sizes.
+--permutations N (optional): Also add empirical p-values from N random relabelings of the probands
+    (whole CSV and Parquet/Feather inputs).
+--hotspots WINDOW (optional): Also save OUTPUT_PATH_hotspots, the sliding windows of WINDOW bases (every
+    --hotspot-step bases) over CHROM/POS where proband carriers are over-represented, overall and per source
+    (whole CSV and Parquet/Feather inputs).
+--segregation (optional): Add the trio counts of every interval: probands, inherited and putative de novo
+    carriers and maternal / paternal carriers (the metadata 'family' column and fam_relation 0/1/2 =
+    proband/mother/father). Whole CSV and Parquet/Feather inputs.
 
 Example Usage:
 --------------
@@ -28,32 +55,46 @@ python hot_peaks_table.py.py data/pipeline_outputs/variants_with_layers/qualityD
 
 Note:
 -----
-- The script requires the Pandarallel library for parallel processing.
+- The interval statistics are vectorized over all intervals (see bin/interval_stats.py).
 - Ensure that the specified paths are correct and accessible.
+- With --chunksize the variant CSV must be sorted by --sort-key; peak memory then depends on the chunk size.
 - If UPLOAD_PATH is omitted, the output Excel file won't be uploaded.
 """
 
+from bin.options import parse_args
+
+if __name__ == "__main__":
+    # parse the command line (and answer --help) before loading pandas and the analysis modules
+    ARGS = parse_args()
+
 import numpy as np
 import pandas as pd
 import os
-import sys
-from pandarallel import pandarallel
-pandarallel.initialize(progress_bar=True, nb_workers=8)
 import  bin.Gonen_func as gf
+import bin.enrichment as enr
+import bin.hotspots as hotspots
+import bin.interval_stats as ist
+import bin.result_cache as rc
+import bin.segregation as seg
+import bin.run_report as run_report
+import bin.variant_io as vio
+import bin.workers as workers_pool
+from bin.carrier_matrix import CarrierMatrix
+from bin.cohort_index import FAMILY_COLUMN, CohortIndex, get_cohort_index
+from bin.presence_matrix import PresenceMatrix, get_gt_columns
+from bin.genomic_index import load_bed_index
 
-VAR_CSV_PATH = 1
-SAMPLE_MATADTA_PATH = 2
-OUTPUT_PATH = 3
-UPLOAD_PATH = 4
 GENES_LOCATIONS_FILE = "data/read_only/layers_data/hg38_dsd_genes_locations.bed"
+GENES_COLUMN = 'DSDgenes_1.5mb'
+INFO_COLUMNS = ['CHROM','from', 'to', 'length', 'DSDgenes_1.5mb','geneHancer', 'GHid', 'GH_is_elite', 'GH_type']
 
-def get_interval_stats(df_in, pedg_df):
+def get_interval_stats(df_in, cohort):
     """
     Calculate various statistics for intervals based on the provided dataframes.
 
     Parameters:
         df_in (DataFrame): Input dataframe containing variant information.
-        pedg_df (DataFrame): Pedigree dataframe containing sample information.
+        cohort (CohortIndex): Sample groups of the pedigree (or the pedigree dataframe).
 
     Returns:
         pd.Series: Calculated statistics for the intervals.
@@ -69,24 +110,25 @@ def get_interval_stats(df_in, pedg_df):
     # Create an empty Series to store the calculated statistics
     sum_series = pd.Series(dtype=float)
     
-    # Extract proband IDs from the pedigree dataframe
-    probands =  pedg_df[pedg_df.fam_relation == 0].ID.astype(str)
+    # Membership of every sample in the proband and source groups
+    labels, masks = get_cohort_index(cohort).group_masks(df.columns)
+    exist_groups = exist_per_sample.to_numpy(dtype=np.int64) @ masks
+    sum_groups = sum_per_sample.to_numpy(dtype=np.int64) @ masks
     
     # Calculate statistics for all sources
-    sum_series['total n probands'] = exist_per_sample[exist_per_sample.index.isin(probands)].sum()
+    sum_series['total n probands'] = exist_groups[0]
     sum_series['total n non-DSD'] = exist_per_sample.sum() - sum_series['total n probands']
-    sum_series['total n proband variants'] = sum_per_sample[sum_per_sample.index.isin(probands)].sum()
+    sum_series['total n proband variants'] = sum_groups[0]
     sum_series['total n non-DSD variants'] = sum_per_sample.sum() - sum_series['total n proband variants']
     
     # Calculate statistics for each data source
-    for label in pedg_df.source.unique():
-        label_id = pedg_df[pedg_df.source == label].ID.astype(str)
-        probans_id = label_id[label_id.isin(probands)]
+    for i, label in enumerate(labels):
+        in_label, label_probands = 1 + 2 * i, 2 + 2 * i
         
         # Statistics for probands and non-DSD samples for each label
-        sum_series[f'{label} n probands'] = exist_per_sample[exist_per_sample.index.isin(probans_id)].sum()
-        sum_series[f'{label} n non-DSD'] = exist_per_sample[exist_per_sample.index.isin(label_id)].sum() - sum_series[f'{label} n probands']
-        sum_series[f'{label} n proband variants'] = sum_per_sample[sum_per_sample.index.isin(probans_id)].sum()
+        sum_series[f'{label} n probands'] = exist_groups[label_probands]
+        sum_series[f'{label} n non-DSD'] = exist_groups[in_label] - sum_series[f'{label} n probands']
+        sum_series[f'{label} n proband variants'] = sum_groups[label_probands]
         sum_series[f'{label} n non-DSD variants'] = sum_per_sample.sum() - sum_series[f'{label} n proband variants']
     
     return sum_series
@@ -101,69 +143,379 @@ def bool_variant_df(df):
     Returns:
         DataFrame: Boolean table indicating presence of variants in samples.
     """
-    # Extract genotype columns by filtering column names ending with 'GT'
-    gt = df[[i for i in df.columns if i.endswith('GT')]].replace(' ',np.nan).replace('',np.nan).notna()
-    
-    # Rename genotype columns for clarity
-    gt.columns = [i.replace(':GT','') for i in gt.columns]
+    # Pack the genotype columns (ending with 'GT') and unpack them as one column per sample
+    gt = PresenceMatrix.from_gt_frame(df).to_frame(index=df.index)
     
     # Concatenate the INTERVAL_ID column with the boolean genotype table
     return pd.concat([df[['INTERVAL_ID']], gt], axis=1)
 
 # ... (similar explanations for other functions)
 
-def split_by_gene(x):
-      splitted_genes = x['DSDgenes_1.5mb'].split(',')
-      new_df = pd.DataFrame({'DSDgenes_1.5mb': splitted_genes})
-      new_df['DSDgenes_1.5mb'] = pd.Series(splitted_genes)
-      return new_df['DSDgenes_1.5mb'][0]
-
-# some rows have a few genes in 'DSDgenes_1.5mb' and this function splits them to several rows
-def handle_multi_gene_rows(df):
-    # Create a copy of the DataFrame to work with
-    new_df = df.copy()
-    new_rows = new_df.apply(lambda x: split_by_gene(x) if pd.notna(x['DSDgenes_1.5mb']) else None, axis=1)
-    # Create a new DataFrame with the updated rows
-    new_rows = new_rows.reset_index(drop=True)
-    new_df['DSDgenes_1.5mb'] = new_rows
-    return new_df
-
-def calculate_minimal_distance_from_gene(df, locations):
-    df['DSDgenes_1.5mb'] = df['DSDgenes_1.5mb'].astype(str)
-    locations['gene'] = locations['gene'].astype(str)
-    # Merge locations with df based on 'DSDgenes_1.5mb'
-    merged_df = df.merge(locations, left_on='DSDgenes_1.5mb', right_on='gene', how='left')
-
-    # Calculate distances
-    merged_df['dist_from_start'] = abs(merged_df['from'] - merged_df['start'])
-    merged_df['dist_from_end'] = abs(merged_df['to'] - merged_df['start'])
-    # Calculate minimum distance from both start and end of gene
-    merged_df['distance_from_nearest_DSD_TSS'] = merged_df[['dist_from_start', 'dist_from_end']].min(axis=1)
-
-    # Drop unnecessary columns
-    result_df = merged_df.drop(columns=['start', 'end', 'gene', 'dist_from_start', 'dist_from_end', 'chr'])
-    return result_df
+def explode_genes(df, column=GENES_COLUMN):
+    """
+    Split the comma separated gene lists of the peaks into a long peak x gene table.
+
+    The lists are split once per distinct value (as categorical codes) and the pairs are
+    gathered with numpy indexing, so no per-row Python objects are created.
+
+    Parameters:
+        df (DataFrame): Peaks table with INTERVAL_ID and the gene list column.
+        column (str): Name of the gene list column.
+
+    Returns:
+        DataFrame: One row per peak - gene pair with the columns INTERVAL_ID and gene (categorical).
+    """
+    lists = df[column].astype('category')
+    split_lists = lists.cat.categories.astype(str).str.split(',')
+    list_lengths = np.append(split_lists.str.len().to_numpy(dtype=np.int64), 0)
+    gene_codes, genes = pd.factorize(np.concatenate([np.asarray(i, dtype=object) for i in split_lists] or [[]]))
+    list_offsets = np.append(np.cumsum(list_lengths[:-1]) - list_lengths[:-1], 0)
+
+    # missing lists (code -1) take the trailing empty entry
+    row_codes = lists.cat.codes.to_numpy()
+    row_lengths = list_lengths[row_codes]
+    rows = np.repeat(np.arange(len(df)), row_lengths)
+    pair_starts = np.cumsum(row_lengths) - row_lengths
+    positions = np.arange(len(rows)) - np.repeat(pair_starts, row_lengths) + np.repeat(list_offsets[row_codes], row_lengths)
+
+    genes = pd.Index(genes).str.strip()
+    return pd.DataFrame({'INTERVAL_ID': df['INTERVAL_ID'].to_numpy()[rows],
+                         'gene': pd.Categorical(genes[gene_codes[positions]])})
+
+def get_gene_distances(genes_df, df, gene_index):
+    """
+    Calculate the TSS distance of every peak - gene pair.
+
+    Parameters:
+        genes_df (DataFrame): Long peak x gene table, as returned by `explode_genes`.
+        df (DataFrame): Peaks table with the INTERVAL_ID, from and to columns.
+        gene_index (GenomicIndex): Index of the gene locations (a gene with a few locations
+            is measured to the nearest one).
+
+    Returns:
+        DataFrame: genes_df with a 'distance' column (NaN for genes without a location).
+    """
+    pairs = genes_df.merge(df[['INTERVAL_ID', 'from', 'to']], on='INTERVAL_ID', how='left')
+    pairs['distance'] = gene_index.named_distance(pairs['gene'].astype(str), pairs['from'], pairs['to'])
+    return pairs[['INTERVAL_ID', 'gene', 'distance']]
+
+def get_nearest_gene(gene_distances):
+    """
+    Pick the nearest listed gene of every peak, with its distance.
+
+    Parameters:
+        gene_distances (DataFrame): Peak x gene distances, as returned by `get_gene_distances`.
+
+    Returns:
+        DataFrame: The 'gene' and 'distance' of the nearest gene of every peak, indexed by
+        INTERVAL_ID. Peaks whose genes have no location keep their first listed gene, with a
+        NaN distance.
+    """
+    nearest = gene_distances.sort_values('distance', kind='stable').drop_duplicates(subset='INTERVAL_ID')
+    nearest = nearest.set_index('INTERVAL_ID')[['gene', 'distance']]
+    return nearest.assign(gene=nearest['gene'].astype(str))
 
 def add_dsd_distance(df):
     df.reset_index(inplace=True)
-    # Read DSD genes' locations file
-    locations = pd.read_table(GENES_LOCATIONS_FILE)
-    locations.columns = ['chr', 'start', 'end', 'gene']
-    # split df by values in 'DSDgenes_1.5mb'
-    new_df = handle_multi_gene_rows(df)
-    result_df = calculate_minimal_distance_from_gene(new_df, locations)
-    # Keep only rows with minimal distance from DSD gene
-    result_df = result_df.sort_values(by=['INTERVAL_ID', 'distance_from_nearest_DSD_TSS']).drop_duplicates(subset='INTERVAL_ID')
+    dsd_index = load_bed_index(GENES_LOCATIONS_FILE)
+    # Keep the nearest of the genes listed in 'DSDgenes_1.5mb'
+    gene_distances = get_gene_distances(explode_genes(df), df, dsd_index)
+    nearest = get_nearest_gene(gene_distances)
+    df[GENES_COLUMN] = df['INTERVAL_ID'].map(nearest['gene'])
+    # Distance from the TSS of that gene
+    df['distance_from_nearest_DSD_TSS'] = df['INTERVAL_ID'].map(nearest['distance'])
+    result_df = df.sort_values(by='INTERVAL_ID')
     result_df.set_index('INTERVAL_ID', inplace=True)
     
     return result_df
 
 def get_info_table(df):
-    relevant_coulmns = ['CHROM','from', 'to', 'length', 'DSDgenes_1.5mb','geneHancer', 'GHid', 'GH_is_elite', 'GH_type']
     df = df[~df.INTERVAL_ID.duplicated()].set_index('INTERVAL_ID')
-    return df[relevant_coulmns]
+    return df[INFO_COLUMNS]
+
+def analyze_peaks(df, cohort, workers=None, backend='serial', sparse=False, permutations=0, segregation=False):
+    """
+    Calculate the interval statistics of a whole variant table.
+
+    Parameters:
+        df (DataFrame): Input dataframe containing variant information.
+        cohort (CohortIndex): Sample groups of the pedigree (or the pedigree dataframe).
+        workers (int, optional): Number of workers for the interval statistics.
+        backend (str, optional): Worker backend - 'process', 'thread' or 'serial'.
+        sparse (bool, optional): Keep only the carriers (CarrierMatrix) instead of the packed
+            presence bits, for tables of rare variants. The workers are not used then.
+        permutations (int, optional): Add the proband label permutation p-values of this many
+            permutations (see `enr.permutation_pvalues`). Defaults to 0 (none).
+        segregation (bool, optional): Add the trio segregation counts (see `seg.interval_segregation`).
+
+    Returns:
+        DataFrame: Interval information and statistics, indexed by INTERVAL_ID.
+    """
+    # Pack the genotype presence bits (or collect the carriers) and compute the statistics of all intervals at once
+    matrix = CarrierMatrix.from_gt_frame(df) if sparse else PresenceMatrix.from_gt_frame(df)
+    peak_df = ist.get_all_interval_stats(matrix, df.INTERVAL_ID, cohort, workers, backend)
+    if permutations:
+        peak_df = pd.concat([peak_df, enr.permutation_pvalues(matrix, df.INTERVAL_ID, cohort, permutations)], axis=1)
+    if segregation:
+        peak_df = pd.concat([peak_df, seg.interval_segregation(matrix, df.INTERVAL_ID, cohort)], axis=1)
+
+    # Combine interval information and analysis results
+    return pd.concat([get_info_table(df), peak_df], axis=1)
+
+def analyze_columnar_peaks(sample_file_path, cohort, workers=None, backend='serial', sparse=False, permutations=0,
+                           segregation=False):
+    """
+    Calculate the interval statistics of a Parquet / Feather variant table.
+
+    Only INTERVAL_ID, the info columns and the ':GT' columns are read, and the presence
+    matrix is built from the Arrow buffers of the genotype columns.
+
+    Parameters:
+        sample_file_path (str): Path to the Parquet / Feather input file.
+        cohort (CohortIndex): Sample groups of the pedigree (or the pedigree dataframe).
+        workers (int, optional): Number of workers for the interval statistics.
+        backend (str, optional): Worker backend - 'process', 'thread' or 'serial'.
+        sparse (bool, optional): Keep only the carriers (CarrierMatrix) instead of the packed presence bits.
+        permutations (int, optional): Add the proband label permutation p-values of this many permutations.
+        segregation (bool, optional): Add the trio segregation counts.
 
-def main(sample_file_path, pedg_path, output_file, upload_path=None):
+    Returns:
+        DataFrame: Interval information and statistics, indexed by INTERVAL_ID.
+    """
+    table = vio.read_variant_columns(sample_file_path, ['INTERVAL_ID'] + INFO_COLUMNS)
+    matrix = CarrierMatrix.from_arrow(table) if sparse else PresenceMatrix.from_arrow(table)
+    info_df = table.select(['INTERVAL_ID'] + INFO_COLUMNS).to_pandas()
+    peak_df = ist.get_all_interval_stats(matrix, info_df.INTERVAL_ID, cohort, workers, backend)
+    if permutations:
+        peak_df = pd.concat([peak_df, enr.permutation_pvalues(matrix, info_df.INTERVAL_ID, cohort, permutations)],
+                            axis=1)
+    if segregation:
+        peak_df = pd.concat([peak_df, seg.interval_segregation(matrix, info_df.INTERVAL_ID, cohort)], axis=1)
+    return pd.concat([get_info_table(info_df), peak_df], axis=1)
+
+def analyze_hotspots(sample_file_path, cohort, window=hotspots.DEFAULT_WINDOW, step=hotspots.DEFAULT_STEP,
+                     sparse=False, max_q=hotspots.MAX_Q):
+    """
+    Find the sliding windows where proband carriers are over-represented (see `hotspots.find_hotspots`).
+
+    Only CHROM, POS and the ':GT' columns of the variant file are read.
+
+    Parameters:
+        sample_file_path (str): Path to the variant CSV, Parquet or Feather file.
+        cohort (CohortIndex): Sample groups of the pedigree (or the pedigree dataframe).
+        window (int, optional): Window length in bases.
+        step (int, optional): Distance between window starts.
+        sparse (bool, optional): Keep only the carriers (CarrierMatrix) instead of the packed presence bits.
+        max_q (float, optional): Report the windows with a total q-value up to this.
+
+    Returns:
+        DataFrame: The hotspot windows, indexed by WINDOW_ID.
+    """
+    if vio.is_columnar(sample_file_path):
+        table = vio.read_variant_columns(sample_file_path, ['CHROM', 'POS'])
+        matrix = CarrierMatrix.from_arrow(table) if sparse else PresenceMatrix.from_arrow(table)
+        df = table.select(['CHROM', 'POS']).to_pandas()
+    else:
+        header = pd.read_csv(sample_file_path, encoding='latin1', nrows=0).columns
+        df = pd.read_csv(sample_file_path, encoding='latin1', usecols=['CHROM', 'POS'] + get_gt_columns(header))
+        matrix = CarrierMatrix.from_gt_frame(df) if sparse else PresenceMatrix.from_gt_frame(df)
+    return hotspots.find_hotspots(matrix, df.CHROM, df.POS, cohort, window, step, max_q=max_q)
+
+def save_hotspots(hotspot_df, cohort, output_file, upload_path, output_formats=('xlsx',)):
+    window_dict = {'Window': ['CHROM', 'from', 'to', 'n variants']}
+    window_dict.update(create_sample_dict(cohort, hotspot_df.columns))
+    gf.create_tables(hotspot_df, window_dict, output_file, output_formats, upload_path=upload_path)
+
+def iter_chunk_interval_sums(sample_file_path, chunksize, sort_key='INTERVAL_ID'):
+    """
+    Reduce the variant CSV to per-interval sample counts while reading it in chunks.
+
+    The CSV must be sorted (or at least grouped) by `sort_key`. Each chunk is reduced
+    to per-interval sample counts; intervals whose key may continue in the next chunk
+    are kept as partial sums and merged with it, all the others are final. Peak memory
+    depends on the chunk size (and the intervals of one key), not on the input size.
+
+    Parameters:
+        sample_file_path (str): Path to the sample input file.
+        chunksize (int): Number of variant rows read at a time.
+        sort_key (str): Column the CSV is sorted by - INTERVAL_ID or CHROM.
+
+    Yields:
+        tuple: (info, sums) of the intervals finished with every chunk - the interval
+        info table and the interval x sample variant counts, indexed by INTERVAL_ID.
+    """
+    pending_info, pending_sums = None, None
+    finished_keys = set()
+
+    for chunk in pd.read_csv(sample_file_path, encoding='latin1', chunksize=chunksize):
+        keys = chunk[sort_key]
+        if finished_keys.intersection(keys.unique()):
+            raise ValueError(f"{sample_file_path} is not sorted by {sort_key}, can't read it in chunks")
+
+        matrix = PresenceMatrix.from_gt_frame(chunk)
+        codes, index = ist.get_interval_codes(chunk.INTERVAL_ID)
+        sums = pd.DataFrame(matrix.interval_sums(codes, len(index)), index=index, columns=matrix.samples)
+        info = get_info_table(chunk)
+
+        # Merge the partial intervals left over from the previous chunk
+        if pending_sums is not None:
+            sums = pd.concat([pending_sums, sums]).groupby(level=0).sum()
+            info = pd.concat([pending_info, info])
+            info = info[~info.index.duplicated()]
+
+        # Intervals of the last key may continue in the next chunk
+        last_key = keys.iloc[-1]
+        open_intervals = chunk.INTERVAL_ID[keys == last_key].unique()
+        is_open = sums.index.isin(open_intervals)
+        info_open = info.index.isin(open_intervals)
+
+        yield info[~info_open], sums[~is_open]
+        pending_sums, pending_info = sums[is_open], info[info_open]
+        finished_keys.update(keys[keys != last_key].unique())
+
+    if pending_sums is not None:
+        yield pending_info, pending_sums
+
+def analyze_peaks_in_chunks(sample_file_path, cohort, chunksize, sort_key='INTERVAL_ID'):
+    """
+    Calculate the interval statistics while reading the variant CSV in chunks.
+
+    See `iter_chunk_interval_sums` for the chunking.
+
+    Parameters:
+        sample_file_path (str): Path to the sample input file.
+        cohort (CohortIndex): Sample groups of the pedigree (or the pedigree dataframe).
+        chunksize (int): Number of variant rows read at a time.
+        sort_key (str): Column the CSV is sorted by - INTERVAL_ID or CHROM.
+
+    Returns:
+        DataFrame: Interval information and statistics, indexed by INTERVAL_ID.
+    """
+    info_parts, stats_parts = [], []
+    for info, sums in iter_chunk_interval_sums(sample_file_path, chunksize, sort_key):
+        stats_parts.append(ist.interval_stats_from_sums(sums, cohort))
+        info_parts.append(info)
+
+    peak_df = pd.concat(stats_parts).sort_index()
+    return pd.concat([pd.concat(info_parts), peak_df], axis=1)
+
+def compute_interval_sums(sample_file_path, chunksize=None, sort_key='INTERVAL_ID'):
+    """
+    Parse a variant file to its interval info table and per-interval sample counts.
+
+    Parameters:
+        sample_file_path (str): Path to the sample input file (CSV, Parquet or Feather).
+        chunksize (int, optional): Stream the input CSV in chunks of this many rows.
+        sort_key (str, optional): Column the input CSV is sorted by, for the chunked mode.
+
+    Returns:
+        tuple: (info, sums) - the interval info table and the interval x sample variant
+        counts, both indexed by INTERVAL_ID.
+    """
+    if vio.is_columnar(sample_file_path):
+        table = vio.read_variant_columns(sample_file_path, ['INTERVAL_ID'] + INFO_COLUMNS)
+        matrix = PresenceMatrix.from_arrow(table)
+        df = table.select(['INTERVAL_ID'] + INFO_COLUMNS).to_pandas()
+    elif chunksize:
+        parts = list(iter_chunk_interval_sums(sample_file_path, chunksize, sort_key))
+        info = pd.concat([info for info, _ in parts])
+        sums = pd.concat([sums for _, sums in parts]).sort_index()
+        return info, sums
+    else:
+        df = pd.read_csv(sample_file_path, encoding='latin1')
+        matrix = PresenceMatrix.from_gt_frame(df)
+
+    codes, index = ist.get_interval_codes(df.INTERVAL_ID)
+    sums = pd.DataFrame(matrix.interval_sums(codes, len(index)), index=index, columns=matrix.samples)
+    return get_info_table(df), sums
+
+def analyze_cached_peaks(sample_file_path, cohort, cache, chunksize=None, sort_key='INTERVAL_ID'):
+    """
+    Calculate the interval statistics from the cached per-interval sample counts.
+
+    The variant file is parsed (and its counts stored in the cache) only when its
+    content is not in the cache yet; otherwise the statistics are the cached counts
+    regrouped by the current pedigree.
+
+    Parameters:
+        sample_file_path (str): Path to the sample input file.
+        cohort (CohortIndex): Sample groups of the pedigree (or the pedigree dataframe).
+        cache (ResultCache): The result cache.
+        chunksize (int, optional): Stream the input CSV in chunks of this many rows.
+        sort_key (str, optional): Column the input CSV is sorted by, for the chunked mode.
+
+    Returns:
+        DataFrame: Interval information and statistics, indexed by INTERVAL_ID.
+    """
+    key = cache.key(sample_file_path)
+    cached = cache.load_sums(key)
+    if cached is None:
+        info, sums = compute_interval_sums(sample_file_path, chunksize, sort_key)
+        cache.store(key, info, sums)
+    else:
+        print("Using cached interval counts")
+        info, sums = cached
+    return pd.concat([info, ist.interval_stats_from_sums(sums, cohort)], axis=1)
+
+def read_previous_result(path):
+    """
+    Read a hot peaks table saved as Parquet, Feather or gzipped TSV, with flat columns.
+
+    Parameters:
+        path (str): Path to the saved table. The Excel table is capped at Excel's row
+            limit, so it can't be read back as a complete result.
+
+    Returns:
+        DataFrame: The table's columns, indexed by INTERVAL_ID.
+    """
+    if path.endswith('.xlsx'):
+        raise ValueError(f"Can't update {path}: save the previous result with --output-format parquet, "
+                         "feather or tsv.gz")
+    df = gf.read_table_file(path).droplevel(0, axis=1)
+    return df.loc[:, ~df.columns.duplicated()]
+
+def update_peaks(previous_result_path, sample_file_path, cohort, chunksize=None, sort_key='INTERVAL_ID'):
+    """
+    Add the samples of a new variant file to a previous hot peaks table.
+
+    The statistics are counts over the samples, so the statistics of the new samples
+    are added to the previous ones (see `ist.add_interval_stats`) and only the new
+    variant file is parsed. Only the intervals the previous table doesn't have get
+    their DSD distance calculated. The result is the same as a full run on both sets
+    of samples, as long as the new file has none of the previous samples and the
+    previous samples' metadata is unchanged.
+
+    Parameters:
+        previous_result_path (str): Previous table, saved as Parquet, Feather or gzipped TSV.
+        sample_file_path (str): Variant file with only the new samples' columns.
+        cohort (CohortIndex): Sample groups (or pedigree dataframe) of all the samples, previous and new.
+        chunksize (int, optional): Stream the input CSV in chunks of this many rows.
+        sort_key (str, optional): Column the input CSV is sorted by, for the chunked mode.
+
+    Returns:
+        DataFrame: Interval information, DSD distance and statistics, indexed by INTERVAL_ID.
+    """
+    previous = read_previous_result(previous_result_path)
+    # the enrichment and segregation of the previous samples alone are out of date
+    previous = previous.drop(columns=enr.get_enrichment_columns(previous.columns)
+                             + seg.get_segregation_columns(previous.columns))
+    stat_columns = ist.get_stat_columns(previous.columns)
+
+    info, sums = compute_interval_sums(sample_file_path, chunksize, sort_key)
+    stats = ist.add_interval_stats(previous[stat_columns], ist.interval_stats_from_sums(sums, cohort),
+                                   list(get_cohort_index(cohort).labels))
+
+    new_info = info[~info.index.isin(previous.index)].copy()
+    if new_info.shape[0]:
+        new_info = add_dsd_distance(new_info)
+    info = pd.concat([previous.drop(columns=stat_columns), new_info]).sort_index()
+    return pd.concat([info, stats], axis=1)
+
+def main(sample_file_path, pedg_path, output_file, upload_path=None, chunksize=None, sort_key='INTERVAL_ID',
+         output_formats=('xlsx',), workers=None, backend=workers_pool.DEFAULT_BACKEND, cache_dir=None,
+         cache_size=rc.DEFAULT_MAX_GB, previous_result=None, report_path=None, profile=False,
+         sparse=False, enrichment=False, permutations=0, hotspot_window=None, hotspot_step=hotspots.DEFAULT_STEP,
+         segregation=False):
     """
     Main function to perform the analysis and save results.
 
@@ -172,47 +524,135 @@ def main(sample_file_path, pedg_path, output_file, upload_path=None):
         pedg_path (str): Path to the pedigree input file.
         output_file (str): Path for saving the output Excel file.
         upload_path (str, optional): Path for uploading the file. Defaults to None.
+        chunksize (int, optional): Stream the input CSV in chunks of this many rows. Defaults to None (read it whole).
+            Parquet / Feather inputs are always read with column projection instead.
+        sort_key (str, optional): Column the input CSV is sorted by, for the chunked mode. Defaults to 'INTERVAL_ID'.
+        output_formats (list, optional): Output formats out of gf.OUTPUT_FORMATS. Defaults to Excel only.
+        workers (int, optional): Number of workers. Defaults to the available CPUs.
+        backend (str, optional): Worker backend - 'process', 'thread' or 'serial'. Defaults to 'process'.
+        cache_dir (str, optional): Cache the parsed variant file in this directory ('' for the default
+            directory next to the input). Defaults to None (no cache).
+        cache_size (float, optional): Cache size limit in GB. Defaults to rc.DEFAULT_MAX_GB.
+        previous_result (str, optional): Previous table (Parquet, Feather or gzipped TSV) to add the samples
+            of sample_file_path to, see `update_peaks`. Defaults to None (analyze sample_file_path alone).
+        report_path (str, optional): Save the JSON run report (per-stage time, peak RSS, sizes and worker
+            utilization) here ('' for '<output_file>_run_report.json'). Defaults to None (no report file).
+        profile (bool, optional): Save cProfile dumps of every stage in '<output_file>_profile'. Defaults to False.
+        sparse (bool, optional): Compute the statistics on the sparse carriers instead of the packed presence
+            matrix (whole CSV and Parquet / Feather inputs). Defaults to False.
+        enrichment (bool, optional): Add the proband enrichment columns (odds ratio, Fisher p-value and
+            BH q-value per interval, overall and per source). Defaults to False.
+        permutations (int, optional): Also add label permutation p-values of this many permutations (whole CSV
+            and Parquet / Feather inputs). Defaults to 0 (none).
+        hotspot_window (int, optional): Also find the sliding windows of this many bases where proband carriers
+            are over-represented, saved as '<output_file>_hotspots' (whole CSV and Parquet / Feather inputs).
+            Defaults to None (no hotspots).
+        hotspot_step (int, optional): Distance between the hotspot window starts. Defaults to hotspots.DEFAULT_STEP.
+        segregation (bool, optional): Add the trio segregation counts of every interval (whole CSV and Parquet /
+            Feather inputs); the metadata needs complete trios in its family column. Defaults to False.
     """
-    print("Reading files")
-    # Read sample data from CSV and pedigree data from Excel
-    df = pd.read_csv(sample_file_path, encoding='latin1')
-    pedg_df = pd.read_excel(pedg_path)
-    
-    print("Analyzing peaks")
-    # Create a boolean variant dataframe and perform parallel analysis
-    peak_df = bool_variant_df(df)
-    peak_df = peak_df.groupby('INTERVAL_ID').parallel_apply(lambda x: get_interval_stats(x, pedg_df))
-    
-    # Combine interval information and analysis results
-    result = pd.concat([get_info_table(df), peak_df], axis=1)
+    parameters = {'sample_file_path': sample_file_path, 'pedg_path': pedg_path, 'output_file': output_file,
+                  'chunksize': chunksize, 'sort_key': sort_key, 'output_formats': list(output_formats),
+                  'workers': workers, 'backend': backend, 'cache_dir': cache_dir, 'previous_result': previous_result,
+                  'sparse': sparse, 'enrichment': enrichment, 'permutations': permutations,
+                  'hotspot_window': hotspot_window, 'hotspot_step': hotspot_step, 'segregation': segregation}
+    whole_table = not (previous_result or cache_dir is not None or (chunksize and not vio.is_columnar(sample_file_path)))
+    if permutations and not whole_table:
+        raise ValueError("The permutations need the whole variant table (no --update, --cache or --chunksize)")
+    if segregation and not whole_table:
+        raise ValueError("The segregation counts need the whole variant table (no --update, --cache or --chunksize)")
+    if hotspot_window and not whole_table:
+        raise ValueError("The hotspots need the whole variant table (no --update, --cache or --chunksize)")
+    report = run_report.RunReport(f'{output_file}_profile' if profile else None, parameters)
+    n_workers = 1 if backend == 'serial' or sparse else workers or workers_pool.get_default_workers()
 
-    added_result = add_dsd_distance(result)
+    print("Reading files")
+    with report.stage('read_metadata') as record:
+        # Read the sample groups of the pedigree from Excel, once for all the stages
+        cohort = CohortIndex.read_excel(pedg_path)
+        record['rows'] = len(cohort)
+    if segregation and not seg.has_complete_trios(cohort):
+        raise ValueError(f"The segregation counts need trios: a '{FAMILY_COLUMN}' column in {pedg_path} with a "
+                         "proband, mother and father (fam_relation 0, 1 and 2) in the same family")
+
+    if previous_result:
+        print("Updating peaks")
+        with report.stage('update_peaks') as record:
+            added_result = update_peaks(previous_result, sample_file_path, cohort, chunksize, sort_key)
+            record['rows'], record['columns'] = added_result.shape
+    else:
+        if cache_dir is not None:
+            print("Analyzing peaks")
+            cache = rc.ResultCache(cache_dir or rc.get_default_cache_dir(sample_file_path), int(cache_size * 1024 ** 3))
+            with report.stage('analyze_cached_peaks') as record:
+                result = analyze_cached_peaks(sample_file_path, cohort, cache, chunksize, sort_key)
+                record['rows'], record['columns'] = result.shape
+        elif vio.is_columnar(sample_file_path):
+            print("Analyzing peaks")
+            with report.stage('analyze_columnar_peaks', n_workers) as record:
+                result = analyze_columnar_peaks(sample_file_path, cohort, workers, backend, sparse, permutations,
+                                                segregation)
+                record['rows'], record['columns'] = result.shape
+        elif chunksize:
+            print("Analyzing peaks in chunks")
+            with report.stage('analyze_peaks_in_chunks') as record:
+                result = analyze_peaks_in_chunks(sample_file_path, cohort, chunksize, sort_key)
+                record['rows'], record['columns'] = result.shape
+        else:
+            with report.stage('read_variants') as record:
+                # Read sample data from CSV
+                df = pd.read_csv(sample_file_path, encoding='latin1')
+                record['rows'], record['columns'] = df.shape
+            print("Analyzing peaks")
+            with report.stage('analyze_peaks', n_workers) as record:
+                result = analyze_peaks(df, cohort, workers, backend, sparse, permutations, segregation)
+                record['rows'], record['columns'] = result.shape
+
+        with report.stage('add_dsd_distance') as record:
+            added_result = add_dsd_distance(result)
+            record['rows'], record['columns'] = added_result.shape
+
+    if enrichment or permutations:
+        with report.stage('enrichment') as record:
+            added_result = enr.add_interval_enrichment(added_result, cohort)
+            record['rows'], record['columns'] = added_result.shape
 
     print("Saving")
-    # Create and save an Excel file with the analysis results
-    save_to_excel(added_result, pedg_df, output_file, upload_path)
+    with report.stage('save') as record:
+        # Create and save the output files with the analysis results
+        save_to_excel(added_result, cohort, output_file, upload_path, output_formats)
+        record['rows'], record['columns'] = added_result.shape
+
+    if hotspot_window:
+        print("Finding hotspots")
+        with report.stage('hotspots') as record:
+            hotspot_df = analyze_hotspots(sample_file_path, cohort, hotspot_window, hotspot_step, sparse)
+            save_hotspots(hotspot_df, cohort, f'{output_file}_hotspots', upload_path, output_formats)
+            record['rows'], record['columns'] = hotspot_df.shape
 
+    if report_path is not None:
+        report.save(report_path or f'{output_file}_run_report.json')
 
-def get_sample_numbers(pedg_df, source=None):
-    df = pedg_df  if source == None else pedg_df[pedg_df.source == source]
-    result = {'total': df.shape[0],'probands' :(~df.fam_relation.astype(bool)).sum()}
-    return result
 
-def create_sample_dict(pedg_df,columns):
+def get_sample_numbers(cohort, source=None):
+    return get_cohort_index(cohort).sample_numbers(source)
+
+def create_sample_dict(cohort,columns):
     key_template = '%s\n (n=%s n_prob=%s)'
+    cohort = get_cohort_index(cohort)
     
-    numbers = get_sample_numbers(pedg_df)
+    numbers = get_sample_numbers(cohort)
     sample_dict = {key_template % ('total', numbers['total'], numbers['probands']) : [i for i in columns if 'total' in i]} 
-    for sample in  pedg_df.source.unique().tolist():
-        numbers = get_sample_numbers(pedg_df, sample)
+    for sample in  cohort.labels:
+        numbers = get_sample_numbers(cohort, sample)
         sample_dict.update({key_template % (sample, numbers['total'], numbers['probands']) : [i for i in columns if sample in i]})
     return sample_dict
 
-def save_to_excel(result, pedg_df, output_file, upload_path):
+def save_to_excel(result, cohort, output_file, upload_path, output_formats=('xlsx',)):
     interval_dict = {'Peak' : ['CHROM','from','to','length'],
                     'Gene data': ['distance_from_nearest_DSD_TSS','DSDgenes_1.5mb','geneHancer','GHid','GH_is_elite','GH_type']}
-    interval_dict.update(create_sample_dict(pedg_df, result.columns))
-    gf.create_excel(result, interval_dict, output_file, upload_path=upload_path)
+    interval_dict.update(create_sample_dict(cohort, result.columns))
+    gf.create_tables(result, interval_dict, output_file, output_formats, upload_path=upload_path)
 
 
 def create_folders_if_not_exist(file_path):
@@ -233,15 +673,10 @@ def create_folders_if_not_exist(file_path):
         os.makedirs(directory_path)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 4:
-        print("Usage: python hot_peaks_table.py VAR_CSV_PATH SAMPLE_MATADTA_PATH OUTPUT_PATH [UPLOAD_PATH]")
-        sys.exit(1)
-
-    # Get the command line arguments
-    sample_file_path = sys.argv[VAR_CSV_PATH]
-    pedg_path = sys.argv[SAMPLE_MATADTA_PATH]
-    output_path = sys.argv[OUTPUT_PATH]
-    upload_path = sys.argv[UPLOAD_PATH] if len(sys.argv) > UPLOAD_PATH else ""
-
     # Call the main function with the provided arguments
-    main(sample_file_path, pedg_path, output_path, upload_path)
\ No newline at end of file
+    main(ARGS.var_csv_path, ARGS.sample_metadata_path, ARGS.output_path, ARGS.upload_path,
+         chunksize=ARGS.chunksize, sort_key=ARGS.sort_key, output_formats=ARGS.output_format,
+         workers=ARGS.workers, backend=ARGS.backend, cache_dir=ARGS.cache, cache_size=ARGS.cache_size,
+         previous_result=ARGS.update, report_path=ARGS.report, profile=ARGS.profile,
+         sparse=ARGS.sparse, enrichment=ARGS.enrichment, permutations=ARGS.permutations,
+         hotspot_window=ARGS.hotspots, hotspot_step=ARGS.hotspot_step, segregation=ARGS.segregation)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# the synthetic cohort generator of the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from synthetic_cohort import make_genes, make_pedigree, make_variants
+
+
+@pytest.fixture
+def pedigree():
+    return make_pedigree(30, seed=1)
+
+
+@pytest.fixture
+def variants(pedigree):
+    return make_variants(16, 6, pedigree.ID, make_genes(), missing=0.7, seed=1)
@@ -0,0 +1,31 @@
+import numpy as np
+import pyarrow as pa
+
+from bin.carrier_matrix import CarrierMatrix
+from bin.presence_matrix import PresenceMatrix
+
+
+def test_carriers_match_presence(variants):
+    presence = PresenceMatrix.from_gt_frame(variants)
+    carriers = CarrierMatrix.from_gt_frame(variants, chunksize=7)
+
+    assert carriers.shape == presence.shape
+    assert (carriers.to_bool() == presence.to_bool()).all()
+    assert (CarrierMatrix.from_presence(presence, chunksize=5).indices == carriers.indices).all()
+    table = pa.Table.from_pandas(variants, preserve_index=False)
+    assert (CarrierMatrix.from_arrow(table).indptr == carriers.indptr).all()
+
+    mask = np.arange(carriers.n_samples) % 2 == 0
+    assert (carriers.variant_counts() == presence.variant_counts()).all()
+    assert (carriers.variant_counts(mask) == presence.variant_counts(mask)).all()
+    assert carriers.sample_counts().equals(presence.sample_counts())
+
+
+def test_from_coo_sorts_the_carriers():
+    carriers = CarrierMatrix.from_coo(np.array([2, 0, 2, 0]), np.array([1, 2, 0, 0]), 4, ['a', 'b', 'c'])
+
+    assert carriers.indptr.tolist() == [0, 2, 2, 4, 4]
+    assert carriers.indices.tolist() == [0, 2, 0, 1]
+    assert carriers.nnz == 4
+    rows, cols = carriers.to_coo()
+    assert rows.tolist() == [0, 0, 2, 2]
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# the bin scripts import their siblings by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin'))
+import clean_tsv
+
+
+def make_variants(n_rows, first_pos):
+    return pd.DataFrame({
+        'CHROM': 'chr1', 'POS': np.arange(n_rows) * 2 + first_pos, 'REF': 'A', 'ALT': 'G', 'FILTER': 'PASS',
+        'AF': 0.1, 'AF_popmax': 0.2, 'INTERVAL_ID': 'peak_1', 'GHid': 'GH177', 'GH_is_elite': 1, 'GH_type': 'Enhancer',
+        'from': 1, 'to': 3000, 'length': 2999, 'DSDgenes_1.5mb': 'SOX9', 'geneHancer': 'GH177',
+        'S0:GT': '0/1', 'S0:DP': 10, 'S0:GQ': 30,
+    })
+
+
+def test_merge_sorted_text_column_missing_in_first_rows(tmp_path):
+    # GHid and geneHancer are blank in the first 300 sorted rows of every input, so the
+    # first merged parts have no text value in them
+    paths = []
+    for i in range(2):
+        df = make_variants(600, first_pos=1 + i)
+        df.loc[:299, ['GHid', 'geneHancer']] = np.nan
+        paths.append(str(tmp_path / f'variants_{i}.tsv'))
+        df.to_csv(paths[-1], sep='\t', index=False)
+
+    output = str(tmp_path / 'merged.parquet')
+    clean_tsv.merge_sorted_csv_files(paths, output, chunksize=50)
+
+    merged = pd.read_parquet(output)
+    assert len(merged) == 1200
+    assert merged['POS'].is_monotonic_increasing
+    assert merged['geneHancer'].dropna().eq('GH177').sum() == 600
+    assert merged['geneHancer'].isna().sum() == 600
+    assert merged['GHid'].eq('GH177').sum() == 600
+
+
+def test_merge_sorted_orders_chromosomes_by_rank(tmp_path):
+    # chr2 comes before chr10 in the inputs (VCF order), not after it as a string
+    paths = []
+    for i in range(2):
+        df = pd.concat([make_variants(120, first_pos=1 + i).assign(CHROM=chrom) for chrom in ('chr2', 'chr10')],
+                       ignore_index=True)
+        paths.append(str(tmp_path / f'variants_{i}.tsv'))
+        df.to_csv(paths[-1], sep='\t', index=False)
+
+    output = str(tmp_path / 'merged.parquet')
+    clean_tsv.merge_sorted_csv_files(paths, output, chunksize=50)
+
+    merged = pd.read_parquet(output)
+    assert merged['CHROM'].tolist() == ['chr2'] * 240 + ['chr10'] * 240
+    assert merged.groupby('CHROM')['POS'].apply(lambda pos: pos.is_monotonic_increasing).all()
+
+
+def test_merge_sorted_rejects_unsorted_input(tmp_path):
+    df = make_variants(120, first_pos=1)
+    df = pd.concat([df.iloc[60:], df.iloc[:60]], ignore_index=True)
+    path = str(tmp_path / 'variants.tsv')
+    df.to_csv(path, sep='\t', index=False)
+
+    with pytest.raises(ValueError):
+        clean_tsv.merge_sorted_csv_files([path], str(tmp_path / 'merged.parquet'), chunksize=50)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bin.cohort_index import CohortIndex
+
+
+def make_pedigree():
+    return pd.DataFrame({
+        'ID': ['P1', 'M1', 'F1', 'P2', 'M2', 'C1', 'C1'],
+        'source': ['A', 'A', 'A', 'B', 'B', 'B', 'A'],
+        'fam_relation': [0, 1, 2, 0, 1, 1, 1],
+        'family': ['fam1', 'fam1', 'fam1', 'fam2', 'fam2', np.nan, np.nan],
+    })
+
+
+def test_group_masks():
+    cohort = CohortIndex.from_pedigree(make_pedigree())
+    labels, masks = cohort.group_masks(['P2', 'C1', 'X', 'P1'])
+
+    assert labels == ['A', 'B']
+    # [probands, A, A probands, B, B probands]; C1 is listed in both sources, X in none
+    assert masks.astype(int).tolist() == [[1, 0, 0, 1, 1], [0, 1, 0, 1, 0], [0, 0, 0, 0, 0], [1, 1, 1, 0, 0]]
+
+
+def test_trios():
+    cohort = CohortIndex.from_pedigree(make_pedigree())
+
+    assert cohort.trios.tolist() == [[0, 1, 2], [3, 4, -1]]
+    probands, mothers, fathers, sources = cohort.trio_columns(['F1', 'P1', 'M1', 'P2'])
+    assert probands.tolist() == [1, 3]
+    assert mothers.tolist() == [2, -1]
+    assert fathers.tolist() == [0, -1]
+    assert sources.tolist() == [0, 1]
+
+
+def test_sample_numbers_and_read_only():
+    cohort = CohortIndex.from_pedigree(make_pedigree())
+
+    assert cohort.sample_numbers() == {'total': 7, 'probands': 2}
+    assert cohort.sample_numbers('A') == {'total': 4, 'probands': 1}
+    assert cohort.sample_numbers('C') == {'total': 0, 'probands': 0}
+    with pytest.raises(AttributeError):
+        cohort.labels = ('C',)
+    with pytest.raises(ValueError):
+        cohort.is_proband[0] = False
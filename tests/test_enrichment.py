@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import false_discovery_control, fisher_exact
+
+import bin.enrichment as enr
+import bin.interval_stats as ist
+from bin.cohort_index import CohortIndex
+from bin.presence_matrix import PresenceMatrix
+
+
+def test_fisher_and_odds_ratios_match_scipy():
+    rng = np.random.default_rng(0)
+    n_probands, n_others = 12, 20
+    a, b = rng.integers(0, n_probands + 1, 50), rng.integers(0, n_others + 1, 50)
+
+    pvalues = enr.fisher_pvalues(a, b, n_probands, n_others)
+    ratios = enr.odds_ratios(a, b, n_probands, n_others)
+    for i in range(len(a)):
+        table = [[a[i], n_probands - a[i]], [b[i], n_others - b[i]]]
+        statistic, pvalue = fisher_exact(table, alternative='greater')
+        assert np.isclose(pvalues[i], pvalue, rtol=1e-9, atol=1e-12)
+        assert np.isclose(ratios[i], statistic, equal_nan=True)
+
+    # more carriers than samples
+    assert np.isnan(enr.fisher_pvalues([13], [0], n_probands, n_others)).all()
+
+
+def test_bh_qvalues_match_scipy():
+    pvalues = np.random.default_rng(1).random(200) ** 3
+    assert np.allclose(enr.bh_qvalues(pvalues), false_discovery_control(pvalues, method='bh'))
+
+    with_nan = np.concatenate([pvalues[:20], [np.nan]])
+    qvalues = enr.bh_qvalues(with_nan)
+    assert np.isnan(qvalues[-1])
+    assert np.allclose(qvalues[:-1], false_discovery_control(pvalues[:20], method='bh'))
+
+
+def test_interval_enrichment_and_permutations(variants, pedigree):
+    cohort = CohortIndex.from_pedigree(pedigree)
+    matrix = PresenceMatrix.from_gt_frame(variants)
+    stats = ist.get_all_interval_stats(matrix, variants.INTERVAL_ID, cohort)
+
+    enrichment = enr.interval_enrichment(stats, cohort)
+    numbers = cohort.sample_numbers()
+    expected = enr.fisher_pvalues(stats['total n probands'], stats['total n non-DSD'], numbers['probands'],
+                                  numbers['total'] - numbers['probands'])
+    assert np.allclose(enrichment['total p-value'], expected)
+    assert set(enr.get_enrichment_columns(enrichment.columns)) == set(enrichment.columns)
+
+    permuted = enr.permutation_pvalues(matrix, variants.INTERVAL_ID, cohort, 50, batch=16)
+    assert permuted.index.equals(stats.index)
+    assert ((permuted > 0) & (permuted <= 1)).all().all()
+    pd.testing.assert_frame_equal(permuted, enr.permutation_pvalues(matrix, variants.INTERVAL_ID, cohort, 50))
@@ -0,0 +1,43 @@
+import numpy as np
+
+import bin.hotspots as hotspots
+from bin.cohort_index import CohortIndex
+from bin.presence_matrix import PresenceMatrix
+
+
+def test_window_sums_match_brute_force():
+    rng = np.random.default_rng(0)
+    positions = np.sort(rng.integers(0, 50000, 300))
+    counts = rng.integers(0, 4, (300, 2))
+    window, step = 5000, 1500
+
+    starts, n_variants, sums = hotspots.window_sums(positions, counts, window, step)
+    expected_starts = [k * step for k in range(positions.max() // step + 1)
+                       if ((positions >= k * step) & (positions < k * step + window)).any()]
+    assert starts.tolist() == expected_starts
+    for start, n, window_sum in zip(starts, n_variants, sums):
+        in_window = (positions >= start) & (positions < start + window)
+        assert n == in_window.sum()
+        assert (window_sum == counts[in_window].sum(axis=0)).all()
+
+
+def test_find_hotspots_reports_a_proband_cluster(pedigree, variants):
+    cohort = CohortIndex.from_pedigree(pedigree)
+    present = np.zeros((len(variants), len(pedigree)), dtype=bool)
+    # every proband carries the variants of the first interval
+    first_interval = (variants.INTERVAL_ID == variants.INTERVAL_ID.iloc[0]).to_numpy()
+    present[np.ix_(first_interval, cohort.is_proband)] = True
+    # and one non-DSD sample carries a few of the others
+    present[np.flatnonzero(~first_interval)[::4], np.flatnonzero(~cohort.is_proband)[0]] = True
+    matrix = PresenceMatrix.from_bool(present, pedigree.ID)
+
+    found = hotspots.find_hotspots(matrix, variants.CHROM, variants.POS, cohort, window=2000, step=1000)
+    assert len(found)
+    first = variants[first_interval]
+    assert (found.CHROM == first.CHROM.iloc[0]).all()
+    assert (found['from'] <= first.POS.max()).all() and (found['to'] > first.POS.min()).all()
+    assert (found['total n non-DSD carriers'] == 0).all()
+
+    every_window = hotspots.find_hotspots(matrix, variants.CHROM, variants.POS, cohort, window=2000, step=1000,
+                                          max_q=None)
+    assert len(every_window) > len(found)
@@ -0,0 +1,50 @@
+import pandas as pd
+
+import bin.interval_stats as ist
+import hot_peaks_table as hpt
+from bin.carrier_matrix import CarrierMatrix
+from bin.cohort_index import CohortIndex
+from bin.presence_matrix import PresenceMatrix
+
+
+def baseline_stats(df, cohort):
+    # the per-interval statistics of the original groupby(...).apply(get_interval_stats)
+    gt = df.filter(like=':GT')
+    present = gt.notna() & gt.ne(' ')
+    present.columns = [col.replace(':GT', '') for col in gt.columns]
+    bool_df = pd.concat([df[['INTERVAL_ID']], present], axis=1)
+    return bool_df.groupby('INTERVAL_ID').apply(hpt.get_interval_stats, cohort)
+
+
+def test_analyze_peaks_matches_get_interval_stats(variants, pedigree):
+    cohort = CohortIndex.from_pedigree(pedigree)
+    expected = baseline_stats(variants, cohort)
+
+    for sparse in (False, True):
+        result = hpt.analyze_peaks(variants, cohort, sparse=sparse)
+        pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False, check_names=False)
+
+
+def test_presence_carriers_and_sums_agree(variants, pedigree):
+    matrix = PresenceMatrix.from_gt_frame(variants)
+    codes, index = ist.get_interval_codes(variants.INTERVAL_ID)
+    sums = pd.DataFrame(matrix.interval_sums(codes, len(index)), index=index, columns=matrix.samples)
+
+    expected = ist.interval_stats_from_presence(matrix, variants.INTERVAL_ID, pedigree)
+    threaded = ist.interval_stats_from_presence(matrix, variants.INTERVAL_ID, pedigree, workers=3, backend='thread')
+    pd.testing.assert_frame_equal(threaded, expected)
+    pd.testing.assert_frame_equal(ist.interval_stats_from_carriers(CarrierMatrix.from_presence(matrix),
+                                                                   variants.INTERVAL_ID, pedigree),
+                                  expected, check_dtype=False)
+    pd.testing.assert_frame_equal(ist.interval_stats_from_sums(sums, pedigree), expected, check_dtype=False)
+
+
+def test_chunked_matches_whole_table(tmp_path, variants, pedigree):
+    path = str(tmp_path / 'variants.csv')
+    variants.to_csv(path, index=False)
+    cohort = CohortIndex.from_pedigree(pedigree)
+
+    expected = hpt.analyze_peaks(pd.read_csv(path, encoding='latin1'), cohort)
+    for chunksize in (5, 13, 1000):
+        result = hpt.analyze_peaks_in_chunks(path, cohort, chunksize)
+        pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
@@ -0,0 +1,20 @@
+import bin.Gonen_func as gf
+import bin.hotspots as hotspots
+import bin.options as options
+import bin.result_cache as rc
+
+
+def test_option_defaults_match_the_modules():
+    assert options.OUTPUT_FORMATS == gf.OUTPUT_FORMATS
+    assert options.CACHE_DIR_NAME == rc.CACHE_DIR_NAME
+    assert options.DEFAULT_MAX_GB == rc.DEFAULT_MAX_GB
+    assert options.DEFAULT_HOTSPOT_STEP == hotspots.DEFAULT_STEP
+
+
+def test_parse_args():
+    args = options.parse_args(['variants.parquet', 'metadata.xlsx', '/out/table', '--output-format', 'parquet',
+                               '--hotspots', '5000'])
+    assert args.output_format == ['parquet']
+    assert args.hotspots == 5000
+    assert args.hotspot_step == hotspots.DEFAULT_STEP
+    assert args.upload_path == ""
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import bin.interval_stats as ist
+from bin.presence_matrix import PresenceMatrix, gt_presence
+
+
+def dense_presence(df):
+    gt = df.filter(like=':GT').to_numpy(dtype=object)
+    return ~(pd.isna(gt) | (gt == ' ') | (gt == ''))
+
+
+def test_gt_presence():
+    values = np.array(['0/1', ' ', '', None, '0/0', '1|1'], dtype=object)
+    assert gt_presence(values).tolist() == [True, False, False, False, True, True]
+    assert gt_presence(np.array([0, 1, 2, 3], dtype=np.int8)).tolist() == [False, True, True, True]
+
+
+def test_from_gt_frame_matches_dense(variants):
+    matrix = PresenceMatrix.from_gt_frame(variants, chunksize=7)
+    present = dense_presence(variants)
+
+    assert matrix.shape == present.shape
+    assert (matrix.to_bool() == present).all()
+    assert (matrix.variant_counts() == present.sum(axis=1)).all()
+    mask = np.arange(matrix.n_samples) % 3 == 0
+    assert (matrix.variant_counts(mask) == present[:, mask].sum(axis=1)).all()
+    assert (matrix.sample_counts(chunksize=5).to_numpy() == present.sum(axis=0)).all()
+    assert (matrix.carriers(matrix.samples[4]) == np.flatnonzero(present[:, 4])).all()
+
+    table = pa.Table.from_pandas(variants, preserve_index=False)
+    assert (PresenceMatrix.from_arrow(table).packed == matrix.packed).all()
+
+
+def test_interval_sums_and_presence(variants):
+    matrix = PresenceMatrix.from_gt_frame(variants)
+    codes, index = ist.get_interval_codes(variants.INTERVAL_ID)
+    present = pd.DataFrame(dense_presence(variants), columns=matrix.samples)
+    expected = present.groupby(variants.INTERVAL_ID.to_numpy()).sum()
+
+    assert (matrix.interval_sums(codes, len(index), chunksize=5) == expected.loc[index].to_numpy()).all()
+    assert (matrix.interval_presence(codes, len(index)).to_bool() == (expected.loc[index].to_numpy() > 0)).all()
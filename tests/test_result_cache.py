@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import bin.result_cache as rc
+
+
+def make_sums(n_intervals, seed=0):
+    index = pd.Index([f'peak_{i}' for i in range(n_intervals)], name='INTERVAL_ID')
+    info = pd.DataFrame({'CHROM': 'chr1', 'from': np.arange(n_intervals) * 1000}, index=index)
+    sums = pd.DataFrame(np.random.default_rng(seed).integers(0, 300, (n_intervals, 4)), index=index,
+                        columns=['S0', 'S1', 'S2', 'S3'])
+    return info, sums
+
+
+def test_store_and_load(tmp_path):
+    variants = tmp_path / 'variants.csv'
+    variants.write_text('INTERVAL_ID\npeak_0\n')
+    cache = rc.ResultCache(str(tmp_path / 'cache'))
+
+    key = cache.key(str(variants))
+    assert key == rc.hash_file(str(variants))
+    assert cache.load_sums(key) is None
+
+    info, sums = make_sums(20)
+    cache.store(key, info, sums)
+    cached_info, cached_sums = cache.load_sums(key)
+    pd.testing.assert_frame_equal(cached_info, info)
+    pd.testing.assert_frame_equal(cached_sums, sums)
+
+    # a changed file has a new key
+    variants.write_text('INTERVAL_ID\npeak_1\n')
+    assert cache.key(str(variants)) != key
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = rc.ResultCache(str(tmp_path), max_bytes=10 ** 9)
+    for key in ('a', 'b', 'c'):
+        cache.store(key, *make_sums(500))
+    # 'a' is used again, so 'b' is the least recently used entry
+    os.utime(tmp_path / 'b', (0, 0))
+    cache.load_sums('a')
+
+    sizes = dict(cache.entries())
+    cache.max_bytes = sizes['a'] + sizes['c']
+    assert cache.evict() == ['b']
+    assert [key for key, _ in cache.entries()] == ['c', 'a']
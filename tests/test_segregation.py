@@ -0,0 +1,48 @@
+import pandas as pd
+
+import bin.segregation as seg
+from bin.carrier_matrix import CarrierMatrix
+from bin.cohort_index import CohortIndex
+from bin.presence_matrix import PresenceMatrix
+
+
+def make_pedigree(with_fathers=True):
+    return pd.DataFrame({
+        'ID': ['P1', 'M1', 'F1', 'P2', 'M2', 'C1'],
+        'source': ['A', 'A', 'A', 'B', 'B', 'B'],
+        'fam_relation': [0, 1, 2 if with_fathers else 1, 0, 1, 1],
+        'family': ['fam1', 'fam1', 'fam1' if with_fathers else None, 'fam2', 'fam2', None],
+    })
+
+
+def make_presence():
+    samples = ['P1', 'M1', 'F1', 'P2', 'M2', 'C1']
+    carriers = [['P1', 'M1'],  # peak_1: inherited from the mother
+                ['P1'],        # peak_1: de novo, both parents sequenced
+                ['P2'],        # peak_2: the father of P2 isn't sequenced
+                ['F1', 'C1']]  # peak_2: the father of P1 only
+    present = [[sample in variant for sample in samples] for variant in carriers]
+    return PresenceMatrix.from_bool(present, samples), ['peak_1', 'peak_1', 'peak_2', 'peak_2']
+
+
+def test_interval_segregation():
+    matrix, interval_ids = make_presence()
+    cohort = CohortIndex.from_pedigree(make_pedigree())
+
+    result = seg.interval_segregation(matrix, interval_ids, cohort)
+    # probands, inherited, putative de novo, maternal and paternal carriers
+    total = [f'total {name}' for name in seg.SEGREGATION_NAMES]
+    assert result.loc['peak_1', total].tolist() == [1, 1, 1, 1, 0]
+    assert result.loc['peak_2', total].tolist() == [1, 0, 0, 0, 1]
+    # P2 is in B, the father of P1 in A
+    assert result.loc['peak_2', ['A n trio probands', 'A n paternal carriers', 'B n trio probands']].tolist() \
+        == [0, 1, 1]
+    assert seg.get_segregation_columns(result.columns) == list(result.columns)
+
+    sparse = seg.interval_segregation(CarrierMatrix.from_presence(matrix), interval_ids, cohort)
+    pd.testing.assert_frame_equal(sparse, result)
+
+
+def test_has_complete_trios():
+    assert seg.has_complete_trios(CohortIndex.from_pedigree(make_pedigree()))
+    assert not seg.has_complete_trios(CohortIndex.from_pedigree(make_pedigree(with_fathers=False)))